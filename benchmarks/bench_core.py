@@ -0,0 +1,459 @@
+"""
+Benchmarks of the bioxel core pipeline, runs headless without Blender or a GPU.
+
+    uv run python benchmarks/bench_core.py --preset quick --save benchmarks/baseline.json
+    uv run python benchmarks/bench_core.py --preset quick --compare benchmarks/baseline.json
+
+Synthetic volumes of each case are pushed through parsing, layer building,
+resampling, snapshots, cache writing and container IO. Every benchmark
+reports the median/best wall time, throughput in source voxels per second
+and the peak memory allocated while it runs (tracemalloc, numpy buffers
+included, memory of C++ libraries such as SimpleITK is not). Each case is
+also written through the threaded frame pipeline and serially, any
+difference between the two fails the run.
+
+Needs the add-on dependencies from pyproject.toml. openvdb usually only
+ships with Blender, when it can not be imported a stub is used that writes
+the dense grid with numpy, so cache benchmarks then measure frame
+preparation plus a plain array write instead of VDB encoding.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+import numpy as np
+
+ADDON_DIR = Path(__file__).resolve().parents[1] / "src" / "bioxelnodes"
+
+
+@dataclass
+class Case:
+    shape: tuple
+    dtype: str
+    frame_count: int = 1
+    channel_count: int = 1
+    label_count: int = 0
+
+    @property
+    def kind(self):
+        if self.label_count:
+            return "label"
+        return "color" if self.channel_count == 3 else "scalar"
+
+    @property
+    def name(self):
+        x, y, z = self.shape
+        name = f"{x}x{y}x{z}_t{self.frame_count}_c{self.channel_count}_{self.dtype}"
+        if self.label_count:
+            name += f"_l{self.label_count}"
+        return name
+
+    @property
+    def voxel_count(self):
+        x, y, z = self.shape
+        return self.frame_count * x * y * z * self.channel_count
+
+
+PRESETS = {
+    "quick": [
+        Case((64, 64, 64), "uint8", label_count=4),
+        Case((64, 64, 64), "float32"),
+        Case((64, 64, 64), "int16", frame_count=4),
+        Case((64, 64, 64), "uint8", channel_count=3),
+    ],
+    "full": [
+        Case((128, 128, 128), "uint8", label_count=16),
+        Case((128, 128, 128), "uint8", label_count=200),
+        Case((128, 128, 128), "int16"),
+        Case((128, 128, 128), "float32", frame_count=8),
+        Case((128, 128, 128), "uint8", channel_count=3),
+        Case((256, 256, 256), "uint8", label_count=16),
+        Case((256, 256, 256), "int16"),
+        Case((256, 256, 256), "float32"),
+        Case((256, 256, 128), "uint16", frame_count=4, channel_count=2),
+    ],
+}
+
+# files in the folder scanned by collect_sequence
+SEQUENCE_FILE_COUNT = 500
+
+
+def install_openvdb_stub() -> bool:
+    """Register a numpy backed openvdb stand-in, returns True when it is used."""
+    try:
+        import openvdb
+        return getattr(openvdb, "IS_BENCHMARK_STUB", False)
+    except ImportError:
+        pass
+
+    class Grid:
+        # seconds to hold the source buffer, widens races in pipeline checks
+        copy_delay = 0.0
+
+        def __init__(self):
+            self.array = None
+            self.transform = None
+            self.name = ""
+
+        def copyFromArray(self, array):
+            self.array = np.array(array, copy=True)
+            if self.copy_delay:
+                time.sleep(self.copy_delay)
+                # a buffer changed meanwhile by another thread shows up as a mismatch
+                self.array = np.where(self.array == array, self.array, np.nan)
+
+    def write(filepath, grids):
+        with open(filepath, "wb") as f:
+            for grid in grids:
+                np.save(f, grid.array)
+
+    stub = types.ModuleType("openvdb")
+    stub.IS_BENCHMARK_STUB = True
+    stub.FloatGrid = Grid
+    stub.Vec3SGrid = Grid
+    stub.createLinearTransform = lambda matrix: np.asarray(matrix)
+    stub.write = write
+    sys.modules["openvdb"] = stub
+    return True
+
+
+def make_volume(case: Case, seed: int = 0) -> np.ndarray:
+    """Smooth random TXYZC volume, labels are banded into label_count regions."""
+    from scipy import ndimage
+
+    rng = np.random.default_rng(seed)
+    shape = (case.frame_count, *case.shape, case.channel_count)
+    coarse = rng.random((case.frame_count, *[max(2, n // 16) for n in case.shape],
+                         case.channel_count), dtype=np.float32)
+    factors = [1, *[n / c for n, c in zip(case.shape, coarse.shape[1:4])], 1]
+    field = ndimage.zoom(coarse, factors, order=1)[tuple(slice(0, n) for n in shape)]
+    field -= field.min()
+    field /= max(float(field.max()), 1e-6)
+
+    if case.label_count:
+        return np.minimum(field * (case.label_count + 1),
+                          case.label_count).astype(case.dtype)
+
+    dtype = np.dtype(case.dtype)
+    if dtype.kind in "ui":
+        info = np.iinfo(dtype)
+        low = 0 if dtype.kind == "u" else -1024
+        high = min(info.max, 4095) if dtype.itemsize > 1 else info.max
+        return (low + field * (high - low)).astype(dtype)
+    return (field * 1000 - 200).astype(dtype)
+
+
+def measure(run, setup=None, repeat: int = 3):
+    """Time run(setup()) repeat times, setup is not timed."""
+    times = []
+    peak = 0
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        tracemalloc.start()
+        start = time.perf_counter()
+        run(arg)
+        times.append(time.perf_counter() - start)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del arg
+    return {
+        "median": statistics.median(times),
+        "best": min(times),
+        "peak_memory": peak,
+    }
+
+
+def write_fixtures(volume: np.ndarray, fixture_dir: Path):
+    """Write the first frame and channel as NIfTI, MRC and OME-TIFF."""
+    fixtures = {}
+    # files store ZYX
+    zyx = np.ascontiguousarray(volume[0, :, :, :, 0].transpose(2, 1, 0))
+
+    try:
+        import SimpleITK as sitk
+
+        path = fixture_dir / "volume.nii.gz"
+        sitk.WriteImage(sitk.GetImageFromArray(zyx), str(path))
+        fixtures["nifti"] = path
+    except Exception as e:
+        print(f"  skip NIfTI fixture: {e}")
+
+    try:
+        import mrcfile
+
+        # MRC has no uint16 mode before 2015 files, int16 keeps the size
+        mrc_data = zyx.astype(np.int16) if zyx.dtype == np.uint16 else zyx
+        if mrc_data.dtype in [np.int32, np.int64, np.float64]:
+            mrc_data = mrc_data.astype(np.float32)
+        path = fixture_dir / "volume.mrc"
+        with mrcfile.new(str(path), overwrite=True) as mrc:
+            mrc.set_data(mrc_data)
+        fixtures["mrc"] = path
+    except Exception as e:
+        print(f"  skip MRC fixture: {e}")
+
+    try:
+        import tifffile
+
+        path = fixture_dir / "volume.ome.tiff"
+        tifffile.imwrite(str(path), zyx, ome=True, metadata={"axes": "ZYX"})
+        fixtures["tiff"] = path
+    except Exception as e:
+        print(f"  skip TIFF fixture: {e}")
+
+    return fixtures
+
+
+def bench_case(case: Case, repeat: int, work_dir: Path):
+    from bioxel.container import Container
+    from bioxel.data import Data
+    from bioxel.engine import (
+        SNAPSHOT_SHAPE,
+        LayerCacheWriter,
+        cache_layer_data,
+        get_snapshot_slice,
+        get_snapshot_window,
+        write_png,
+    )
+    from bioxel.io import load_container, save_container
+    from bioxel.layer import Layer
+    from bioxel.parse import parse_volumetric_data
+    from bioxel.stream import get_stream_layers, stream_layers
+
+    volume = make_volume(case)
+    voxels = case.voxel_count
+    results = {}
+
+    def make_layer(_=None):
+        return Layer(data=volume.copy(), name=case.name, kind=case.kind)
+
+    def make_data(_=None):
+        data = Data(filepath="", series_id="")
+        data._data = volume
+        data._meta = {"xyz_shape": case.shape, "affine": np.identity(4)}
+        return data
+
+    results["Data.to_layers"] = measure(
+        lambda data: data.to_layers(kind=case.kind), make_data, repeat)
+
+    half_shape = tuple(max(1, n // 2) for n in case.shape)
+    results["Layer.resize"] = measure(
+        lambda layer: layer.resize(half_shape), make_layer, repeat)
+    results["Layer.snapshot"] = measure(
+        lambda layer: layer.snapshot(SNAPSHOT_SHAPE), make_layer, repeat)
+
+    snapshot = make_layer().snapshot(SNAPSHOT_SHAPE)
+    window = get_snapshot_window(snapshot, case.kind)
+    results["write_png[snapshot slice]"] = measure(
+        lambda _: write_png(get_snapshot_slice(snapshot, snapshot.shape[2] // 2, window),
+                            str(work_dir / "slice.png")), None, repeat)
+    results["write_png[snapshot slice]"]["voxels"] = SNAPSHOT_SHAPE[0] * SNAPSHOT_SHAPE[1]
+
+    # label layers are cached per label as masks
+    cache_layer = Layer(data=volume == 1, name=case.name, kind="label") \
+        if case.kind == "label" else make_layer()
+    cache_dir = work_dir / "cache"
+    results["cache_layer_data"] = measure(
+        lambda _: cache_layer_data(cache_layer, str(cache_dir / "layer")), None, repeat)
+
+    def stream_to_cache(_):
+        layers = get_stream_layers(volume, case.kind, case.name)
+        writers = [
+            LayerCacheWriter(cache_dir / f"stream_{i}", layer.name, layer.kind,
+                             np.identity(4), case.frame_count, offset=layer.offset)
+            for i, layer in enumerate(layers)
+        ]
+        stream_layers(volume, layers, case.shape,
+                      lambda i, f, frame: writers[i].write_frame(f, frame))
+        for i, writer in enumerate(writers):
+            writer.finish(f"stream_{i}", len(writers))
+
+    results["stream_layers+LayerCacheWriter"] = measure(stream_to_cache, None, repeat)
+
+    container_path = work_dir / "container.bioxel"
+    container = Container(name=case.name, layers=[Layer(data=volume, name=case.name,
+                                                        kind=case.kind)])
+    results["save_container"] = measure(
+        lambda _: save_container(container, str(container_path), overwrite=True), None, repeat)
+    results["load_container"] = measure(
+        lambda _: load_container(str(container_path)), None, repeat)
+
+    fixture_voxels = case.shape[0] * case.shape[1] * case.shape[2]
+    fixture_dir = work_dir / "fixtures"
+    fixture_dir.mkdir(exist_ok=True)
+    for fmt, path in write_fixtures(volume, fixture_dir).items():
+        results[f"parse_volumetric_data[{fmt}]"] = measure(
+            lambda _: parse_volumetric_data(str(path)), None, repeat)
+        results[f"parse_volumetric_data[{fmt}]"]["voxels"] = fixture_voxels
+
+    rows = []
+    for benchmark, result in results.items():
+        count = result.pop("voxels", voxels)
+        rows.append({
+            "case": case.name,
+            "benchmark": benchmark,
+            "voxels": count,
+            **result,
+            "throughput": count / result["median"] if result["median"] > 0 else 0.0,
+        })
+    return rows
+
+
+def check_pipeline(case: Case, work_dir: Path) -> bool:
+    """
+    Write the case through the threaded pipeline and serially, True when
+    every cache file is identical.
+    """
+    import openvdb
+    from bioxel.engine import PIPELINE_DEPTH, PIPELINE_WRITERS, LayerCacheWriter
+    from bioxel.stream import get_stream_layers, stream_layers
+
+    volume = make_volume(case)
+
+    def write(cache_dir: Path, queue_depth: int):
+        layers = get_stream_layers(volume, case.kind, case.name)
+        writers = [
+            LayerCacheWriter(cache_dir / f"layer_{i}", layer.name, layer.kind,
+                             np.identity(4), case.frame_count, offset=layer.offset)
+            for i, layer in enumerate(layers)
+        ]
+        stream_layers(volume, layers, case.shape,
+                      lambda i, f, frame: writers[i].write_frame(f, frame),
+                      queue_depth=queue_depth, writer_count=PIPELINE_WRITERS)
+        return {path.relative_to(cache_dir): path.read_bytes()
+                for path in sorted(cache_dir.rglob("*.vdb"))}
+
+    copy_delay = getattr(openvdb.FloatGrid, "copy_delay", None)
+    if copy_delay is not None:
+        openvdb.FloatGrid.copy_delay = openvdb.Vec3SGrid.copy_delay = 0.001
+    try:
+        serial = write(work_dir / "serial", 0)
+        pipeline = write(work_dir / "pipeline", PIPELINE_DEPTH)
+    finally:
+        if copy_delay is not None:
+            openvdb.FloatGrid.copy_delay = openvdb.Vec3SGrid.copy_delay = copy_delay
+
+    mismatches = [str(path) for path in serial if pipeline.get(path) != serial[path]]
+    mismatches += [str(path) for path in pipeline if path not in serial]
+    if mismatches:
+        print(f"  pipeline output differs from serial in {len(mismatches)} files: "
+              f"{', '.join(mismatches[:5])}")
+    return not mismatches
+
+
+def bench_collect_sequence(repeat: int, work_dir: Path):
+    from bioxel.parse import collect_sequence
+
+    sequence_dir = work_dir / "sequence"
+    sequence_dir.mkdir()
+    for i in range(SEQUENCE_FILE_COUNT):
+        (sequence_dir / f"slice_{i:04d}.tif").touch()
+    # unrelated files in the same folder
+    for i in range(SEQUENCE_FILE_COUNT // 5):
+        (sequence_dir / f"other_{i:04d}.png").touch()
+
+    result = measure(lambda _: collect_sequence(sequence_dir / "slice_0000.tif"), None, repeat)
+    return {
+        "case": f"sequence_{SEQUENCE_FILE_COUNT}",
+        "benchmark": "collect_sequence",
+        "voxels": 0,
+        **result,
+        "throughput": 0.0,
+    }
+
+
+def compare(rows, baseline_path: Path, threshold: float) -> int:
+    """Print median time ratios against a baseline, returns the regression count."""
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    baseline_rows = {(row["case"], row["benchmark"]): row for row in baseline["results"]}
+
+    regressions = 0
+    print(f"\nCompared with {baseline_path} (ratio = median / baseline median)")
+    for row in rows:
+        base = baseline_rows.get((row["case"], row["benchmark"]))
+        if base is None or base["median"] <= 0:
+            continue
+        ratio = row["median"] / base["median"]
+        mark = ""
+        if ratio > threshold:
+            mark = "  SLOWER"
+            regressions += 1
+        elif ratio < 1 / threshold:
+            mark = "  faster"
+        print(f"{row['case']:<32} {row['benchmark']:<34} {ratio:6.2f}x{mark}")
+    return regressions
+
+
+def print_rows(rows):
+    print(f"\n{'case':<32} {'benchmark':<34} {'median s':>9} {'Mvox/s':>9} {'peak MB':>9}")
+    for row in rows:
+        print(f"{row['case']:<32} {row['benchmark']:<34} {row['median']:9.4f} "
+              f"{row['throughput'] / 1e6:9.1f} {row['peak_memory'] / 1024**2:9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", type=Path, help="write results as a JSON baseline")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="median ratio counted as a regression")
+    args = parser.parse_args(argv)
+
+    is_stub = install_openvdb_stub()
+    sys.path.insert(0, str(ADDON_DIR))
+
+    rows = []
+    failed_checks = []
+    with tempfile.TemporaryDirectory(prefix="bioxel_bench_") as tmp:
+        tmp = Path(tmp)
+        rows.append(bench_collect_sequence(args.repeat, tmp))
+        for index, case in enumerate(PRESETS[args.preset]):
+            print(f"Running {case.name}...")
+            work_dir = tmp / f"case_{index}"
+            work_dir.mkdir()
+            if not check_pipeline(case, work_dir / "check"):
+                failed_checks.append(case.name)
+            rows += bench_case(case, args.repeat, work_dir)
+
+    print_rows(rows)
+    if failed_checks:
+        print(f"\nPipeline output differs from serial output: {', '.join(failed_checks)}")
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps({
+            "meta": {
+                "preset": args.preset,
+                "repeat": args.repeat,
+                "openvdb_stub": is_stub,
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+                "processor": platform.processor(),
+                "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "cases": [{"name": case.name, **asdict(case)} for case in PRESETS[args.preset]],
+            },
+            "results": rows,
+        }, indent=2), encoding="utf-8")
+        print(f"\nSaved results to {args.save}")
+
+    if args.compare:
+        regressions = compare(rows, args.compare, args.threshold)
+        if regressions:
+            print(f"{regressions} benchmarks slower than {args.threshold}x baseline")
+            return 1
+    return 1 if failed_checks else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
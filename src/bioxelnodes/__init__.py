@@ -3,6 +3,7 @@ import bpy.utils.previews as previews
 
 from .constants import PREVIEW_COLLECTIONS
 from .asset_library import remove_bioxel_asset_library_if_exists
+from .preview import PREVIEWS
 from .props import _bioxel_layer_items, _update_layer_gallery, _update_snapshot_z
 
 from . import auto_load
@@ -62,12 +63,13 @@ def unregister():
     for pcoll in PREVIEW_COLLECTIONS.values():
         previews.remove(pcoll)
     PREVIEW_COLLECTIONS.clear()
+    PREVIEWS.clear()
 
 
 def import_worker_cli(args):
-    from .operators import io_worker
+    from .bioxel import worker
 
-    return io_worker.main(args)
+    return worker.main(args)
 
 
 def register_cli_commands():
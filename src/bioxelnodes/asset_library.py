@@ -1,4 +1,5 @@
 import bpy
+from bpy.app.handlers import persistent
 from pathlib import Path
 
 from .constants import LATEST_NODE_LIB_PATH, NODE_LIB_DIRPATH, NODE_LIB_FILENAME
@@ -16,6 +17,9 @@ STATUS_MESSAGES = {
     "ready": "O Bioxel asset library is ready.",
 }
 
+# last status and the asset library (name, path) strings it was computed for
+_status_cache = {"signature": None, "status": None}
+
 
 def _asset_library_path():
     return str(NODE_LIB_DIRPATH)
@@ -62,7 +66,31 @@ def get_bioxel_asset_library():
     return None
 
 
+def _asset_libraries_signature():
+    # plain strings only, comparing them does no path work
+    return tuple((lib.name, lib.path) for lib in _asset_libraries())
+
+
+def invalidate_bioxel_asset_library_status():
+    _status_cache["signature"] = None
+    _status_cache["status"] = None
+
+
 def get_bioxel_asset_library_status():
+    """
+    Status of the O Bioxel asset library, memoized for panel polls.
+
+    - Recomputed when the asset libraries in the preferences change, after
+      add/remove and on file load.
+    """
+    signature = _asset_libraries_signature()
+    if _status_cache["status"] is None or _status_cache["signature"] != signature:
+        _status_cache["status"] = _get_bioxel_asset_library_status()
+        _status_cache["signature"] = signature
+    return _status_cache["status"]
+
+
+def _get_bioxel_asset_library_status():
     lib = _find_bioxel_asset_library()
     lib_path = _normalized_path(_asset_library_path())
 
@@ -119,6 +147,7 @@ def add_bioxel_asset_library():
     lib.name = ASSET_LIBRARY_NAME
     lib.path = _asset_library_path()
     lib.import_method = "PACK"
+    invalidate_bioxel_asset_library_status()
     return lib
 
 
@@ -132,3 +161,19 @@ def remove_bioxel_asset_library_if_exists():
                 prefs.remove(lib)
         except Exception:
             continue
+    invalidate_bioxel_asset_library_status()
+
+
+@persistent
+def _on_load_post(*args):
+    invalidate_bioxel_asset_library_status()
+
+
+def register():
+    bpy.app.handlers.load_post.append(_on_load_post)
+
+
+def unregister():
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    invalidate_bioxel_asset_library_status()
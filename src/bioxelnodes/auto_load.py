@@ -16,7 +16,7 @@ blender_version = bpy.app.version
 modules = None
 ordered_classes = None
 SKIP_MODULE_NAMES = {
-    "operators.io_worker",
+    "bioxel.worker",
 }
 
 
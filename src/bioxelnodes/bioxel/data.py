@@ -177,38 +177,49 @@ class Data:
         progress_callback: ProgressCallback = None,
     ) -> List[Layer]:
         from .layer import Layer
+        from .stream import get_stream_layers, stream_layers
 
-        data = self.data.copy()
-
-        data, layer_shape = self._transform_shape(data, frame_source)
-
-        data = self._preprocess(data, kind, remap)
+        # views of the loaded data, nothing is copied up front
+        data, layer_shape = self._transform_shape(self.data, frame_source)
 
         mat_scale = transforms3d.zooms.zfdir2aff(bioxel_size)
         affine = np.dot(self.meta["affine"], mat_scale)
 
         base_name = layer_name or kind.capitalize()
+        stream = get_stream_layers(
+            data, kind, base_name, remap=remap, split_channel=split_channel
+        )
+        if not stream:
+            return []
 
-        if kind == "label":
-            return self._create_label_layers(
-                data, base_name, layer_shape, affine, smooth, progress_callback
-            )
-        elif kind == "color":
-            return self._create_color_layers(
-                data, base_name, layer_shape, affine, progress_callback
-            )
-        elif kind == "scalar":
-            return self._create_scalar_layers(
-                data,
-                base_name,
-                layer_shape,
-                affine,
-                smooth,
-                split_channel,
-                progress_callback,
-            )
+        outputs = [None] * len(stream)
 
-        return []
+        def sink(layer_index, frame_index, frame):
+            if outputs[layer_index] is None:
+                outputs[layer_index] = np.empty(
+                    (data.shape[0], *frame.shape), dtype=frame.dtype
+                )
+            outputs[layer_index][frame_index] = frame
+
+        def frame_progress(frame, total):
+            if progress_callback:
+                progress_callback(
+                    0.2 + 0.7 * frame / total, f"Processing Frame {frame+1}..."
+                )
+
+        stream_layers(
+            data,
+            stream,
+            layer_shape,
+            sink,
+            smooth=smooth if kind != "color" else 0,
+            progress_callback=frame_progress,
+        )
+
+        return [
+            Layer(data=output, name=layer.name, kind=layer.kind, affine=affine)
+            for layer, output in zip(stream, outputs)
+        ]
 
     def _parse_file(self, progress_callback: ProgressCallback = None):
         data_path = Path(self.filepath).resolve()
@@ -593,179 +604,9 @@ class Data:
         return string
 
     def _transform_shape(self, data, frame_source: str) -> tuple:
-        orig_shape = self.xyz_shape
-
-        if frame_source == "-1":
-            data = data[0:1, :, :, :, :]
-            new_shape = orig_shape
-        elif frame_source == "0":
-            new_shape = orig_shape
-        elif frame_source == "1":
-            data = data.transpose(1, 0, 2, 3, 4)
-            new_shape = (1, orig_shape[1], orig_shape[2])
-        elif frame_source == "2":
-            data = data.transpose(2, 1, 0, 3, 4)
-            new_shape = (orig_shape[0], 1, orig_shape[2])
-        elif frame_source == "3":
-            data = data.transpose(3, 1, 2, 0, 4)
-            new_shape = (orig_shape[0], orig_shape[1], 1)
-        else:
-            data = data.transpose(4, 1, 2, 3, 0)
-            new_shape = orig_shape
-
-        return data, new_shape
-
-    def _preprocess(self, data, kind: str, remap: bool) -> np.ndarray:
-        if kind == "color":
-            if np.issubdtype(data.dtype, np.uint8):
-                data = np.multiply(data, 1.0 / 256, dtype=np.float32)
-            elif data.dtype.kind in ["u", "i"]:
-                data = data.astype(np.float32)
-                min_val, max_val = data.min(), data.max()
-                if max_val != min_val:
-                    data = (data - min_val) / (max_val - min_val)
-                else:
-                    data = np.zeros_like(data, dtype=np.float32)
-            else:
-                data = data.astype(np.float32)
-
-            if data.shape[4] == 1:
-                data = np.repeat(data, repeats=3, axis=4)
-            elif data.shape[4] == 2:
-                zeros_shape = list(data.shape[:4]) + [1]
-                zeros = np.zeros(zeros_shape, dtype=np.float32)
-                data = np.concatenate((data, zeros), axis=-1)
-            elif data.shape[4] > 3:
-                data = data[:, :, :, :, :3]
-
-        elif kind == "scalar":
-            if remap:
-                data = data.astype(np.float32)
-                min_val, max_val = data.min(), data.max()
-                if max_val != min_val:
-                    data = (data - min_val) / (max_val - min_val)
-                else:
-                    data = np.zeros_like(data, dtype=np.float32)
-
-        elif kind == "label":
-            data = data.astype(int)
-
-        return data
-
-    def _create_progress_cb_factory(self, progress_callback):
-        def factory(name, progress, progress_step):
-            def callback(frame, total):
-                if progress_callback:
-                    sub_progress = progress + frame * (progress_step / total)
-                    progress_callback(
-                        sub_progress, f"Processing {name} Frame {frame+1}..."
-                    )
-
-            return callback
-
-        return factory
-
-    def _create_label_layers(
-        self,
-        data,
-        base_name,
-        layer_shape,
-        affine,
-        smooth,
-        progress_callback: ProgressCallback,
-    ):
-        from .layer import Layer
-
-        layers = []
-        label_count = int(np.max(data))
-        if label_count == 0:
-            return layers
-
-        progress_step = 0.7 / label_count
-        cb_factory = self._create_progress_cb_factory(progress_callback)
-
-        for i in range(label_count):
-            name_i = f"{base_name}_{i+1}"
-            progress = 0.2 + i * progress_step
-            if progress_callback:
-                progress_callback(progress, f"Processing {name_i}...")
-
-            label_data = data == np.full_like(data, i + 1)
-            progress_cb = cb_factory(name_i, progress, progress_step)
-
-            layer = Layer(data=label_data, name=name_i, kind="label")
-            layer.resize(
-                shape=layer_shape, smooth=smooth, progress_callback=progress_cb
-            )
-            layer.affine = affine
-            layers.append(layer)
-
-        return layers
-
-    def _create_color_layers(
-        self, data, base_name, layer_shape, affine, progress_callback: ProgressCallback
-    ):
-        from .layer import Layer
-
-        if progress_callback:
-            progress_callback(0.2, f"Processing {base_name}...")
-
-        cb_factory = self._create_progress_cb_factory(progress_callback)
-        progress_cb = cb_factory(base_name, 0.2, 0.7)
-
-        layer = Layer(data=data, name=base_name, kind="color")
-        layer.resize(shape=layer_shape, progress_callback=progress_cb)
-        layer.affine = affine
-
-        return [layer]
-
-    def _create_scalar_layers(
-        self,
-        data,
-        base_name,
-        layer_shape,
-        affine,
-        smooth,
-        split_channel,
-        progress_callback: ProgressCallback,
-    ):
-        from .layer import Layer
-
-        layers = []
-        cb_factory = self._create_progress_cb_factory(progress_callback)
-
-        if split_channel:
-            channel_count = data.shape[-1]
-            progress_step = 0.7 / channel_count
-
-            for i in range(channel_count):
-                name_i = f"{base_name}_{i+1}"
-                progress = 0.2 + i * progress_step
-                if progress_callback:
-                    progress_callback(progress, f"Processing {name_i}...")
-
-                progress_cb = cb_factory(name_i, progress, progress_step)
-                layer = Layer(
-                    data=data[:, :, :, :, i : i + 1], name=name_i, kind="scalar"
-                )
-                layer.resize(
-                    shape=layer_shape, smooth=smooth, progress_callback=progress_cb
-                )
-                layer.affine = affine
-                layers.append(layer)
-        else:
-            if progress_callback:
-                progress_callback(0.2, f"Processing {base_name}...")
-
-            progress_cb = cb_factory(base_name, 0.2, 0.7)
-            layer = Layer(data=data, name=base_name, kind="scalar")
-            layer.resize(
-                shape=layer_shape, smooth=smooth, progress_callback=progress_cb
-            )
-            layer.affine = affine
-            layers.append(layer)
+        from .stream import transform_frame_source
 
-        return layers
+        return transform_frame_source(data, self.xyz_shape, frame_source)
 
 
 # 模块级函数签名
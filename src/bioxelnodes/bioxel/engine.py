@@ -0,0 +1,1220 @@
+"""
+Blender free import engine: parse, resample and write layer caches.
+
+Runs inside Blender or under a plain Python with the add-on dependencies
+(numpy, scipy, SimpleITK, openvdb, ...), so imports can be done by a
+lightweight worker process. The reporter passed to the pipeline functions
+needs report(factor, text, force=False) and check_cancel().
+"""
+import hashlib
+import json
+import math
+import os
+import struct
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import transforms3d
+
+try:
+    import openvdb as vdb
+except ImportError:
+    vdb = None
+
+from .layer import Layer
+from .profile import ImportProfile, get_path_size, profile_stage
+
+CACHE_INFO_FILENAME = "info.json"
+# LOD levels are not generated below this size (in bioxels)
+LOD_MIN_SIZE = 16
+SNAPSHOT_SHAPE = (64, 64, 32)
+# values kept per layer for the histogram of a streamed import
+HISTOGRAM_SAMPLE_COUNT = 2**22
+# values the histogram range percentiles are read from
+HISTOGRAM_BOUND_SAMPLES = 2**16
+HISTOGRAM_BINS = 50
+HISTOGRAM_IMAGE_SIZE = 256
+HISTOGRAM_COLORS = {
+    "scalar": [(0.0, 0.0, 0.0)],
+    "color": [(1.0, 0.39, 0.28), (0.6, 0.8, 0.2), (0.02, 0.6, 1.0)],
+}
+# Bioxel count above which an import is downsampled to fit in memory
+MAX_BIOXEL_COUNT = 100000000
+# share of available memory an import may plan to use
+MEMORY_HEADROOM = 0.8
+# frames prefetched ahead of resampling by default, 0 processes frames serially
+PIPELINE_DEPTH = 2
+# threads writing layer caches when the pipeline is on
+PIPELINE_WRITERS = 2
+# idle frame buffers kept for reuse, full frames and LOD levels of each writer
+SCRATCH_BUFFER_COUNT = 8
+
+
+def get_layer_shape(bioxel_size: float, orig_shape: tuple, orig_spacing: tuple):
+    shape = (
+        int(orig_shape[0] / bioxel_size * orig_spacing[0]),
+        int(orig_shape[1] / bioxel_size * orig_spacing[1]),
+        int(orig_shape[2] / bioxel_size * orig_spacing[2]),
+    )
+
+    return (
+        shape[0] if shape[0] > 0 else 1,
+        shape[1] if shape[1] > 0 else 1,
+        shape[2] if shape[2] > 0 else 1,
+    )
+
+
+def get_fit_bioxel_size(orig_shape: tuple, orig_spacing: tuple, max_count: int):
+    """Smallest uniform bioxel size whose layer shape stays within max_count bioxels."""
+    volume = 1.0
+    for size, spacing in zip(orig_shape, orig_spacing):
+        volume *= size * spacing
+
+    bioxel_size = math.pow(volume / max_count, 1 / 3)
+    shape = get_layer_shape(bioxel_size, orig_shape, orig_spacing)
+    # int() truncation may still overshoot, step up until it fits
+    while shape[0] * shape[1] * shape[2] > max_count:
+        bioxel_size *= 1.01
+        shape = get_layer_shape(bioxel_size, orig_shape, orig_spacing)
+
+    return bioxel_size
+
+
+def get_available_memory() -> int:
+    """Bytes of memory available to a new process, 0 if unknown."""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/meminfo", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) * 1024
+        elif sys.platform == "win32":
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("sullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return int(status.ullAvailPhys)
+        else:
+            # macOS has no cheap "available", total physical memory is the best guess
+            return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except Exception:
+        pass
+    return 0
+
+
+def estimate_import_memory(orig_shape: tuple, layer_shape: tuple,
+                           frame_count: int, channel_count: int, itemsize: int,
+                           config: dict, include_source: bool = True) -> int:
+    """
+    Estimate peak bytes of build_layers for an import.
+
+    - orig_shape and layer_shape are XYZ shapes before frame_source is applied.
+    - config holds the import settings: read_as, frame_source, label_count,
+      split_channel, remap, smooth, queue_depth and lod_count.
+    - Counts the parsed source plus the per-frame temporaries of the
+      streaming engine: prepared frame, resized frame, frames waiting in the
+      pipeline queues, VDB buffers and histogram samples. Frames that stay
+      views of the source (contiguous frames, native resolution, no
+      conversion) are not counted.
+    - include_source=False leaves out the parsed source, for when it is
+      already loaded and no longer part of the available memory.
+    """
+    orig_count = orig_shape[0] * orig_shape[1] * orig_shape[2]
+    layer_count = layer_shape[0] * layer_shape[1] * layer_shape[2]
+    source = frame_count * orig_count * channel_count * itemsize if include_source else 0
+
+    # voxels per frame after frame_source, frames other than "-1"/"0" are transposed
+    frame_source = config.get("frame_source", "-1")
+    in_count, out_count, channels, frames = orig_count, layer_count, channel_count, frame_count
+    is_contiguous = True
+    if frame_source == "-1":
+        frames = 1
+    elif frame_source in ["1", "2", "3"]:
+        axis = int(frame_source) - 1
+        in_count = orig_count // orig_shape[axis] * frame_count
+        out_count = layer_count // layer_shape[axis]
+        frames = orig_shape[axis]
+        is_contiguous = False
+    elif frame_source != "0":
+        channels, frames = frame_count, channel_count
+        is_contiguous = False
+
+    smooth = config.get("smooth", 0)
+    is_resized = in_count != out_count or smooth > 0
+    read_as = config.get("read_as", "SCALAR").upper()
+
+    # layers, channels and value size of the resampled frames, VDB and histogram channels
+    if read_as == "LABEL":
+        layers = max(1, config.get("label_count", 1))
+        out_channels, value_size, vdb_channels, sample_channels = 1, 1, 1, 0
+        # bool mask of the label
+        prepared = in_count
+    elif read_as == "COLOR":
+        layers = 1
+        out_channels, value_size, vdb_channels, sample_channels = 3, 4, 3, 3
+        # float32 conversion, then padded to 3 channels
+        prepared = in_count * (channels + 3) * 4
+    else:
+        layers = channels if config.get("split_channel") else 1
+        out_channels = 1 if config.get("split_channel") else channels
+        value_size = 4 if config.get("remap") else itemsize
+        vdb_channels, sample_channels = 1, 1
+        prepared = in_count * out_channels * 4 if config.get("remap") else 0
+
+    out_frame = out_count * out_channels * value_size
+    # median filter works on a float32 copy of the frame
+    smooth_temp = in_count * out_channels * 4 * 2 if smooth > 0 else 0
+    # zoom output plus its stacked copy
+    resized = out_frame * 2 if is_resized else 0
+
+    # frames held by the pipeline, only when they are copies
+    queue_depth = config.get("queue_depth", PIPELINE_DEPTH)
+    writers = min(PIPELINE_WRITERS, layers) if queue_depth > 0 else 1
+    queued = 0
+    if queue_depth > 0:
+        if not is_contiguous:
+            # prefetched frames plus the ones being read and computed
+            queued += (queue_depth + 2) * in_count * channels * itemsize
+        if prepared or is_resized:
+            queued += writers * (queue_depth + 1) * out_frame
+
+    # scratch buffer and grid copy of every writing thread
+    vdb = out_count * vdb_channels * 4 * 2 * writers
+    if config.get("lod_count", 0) > 0:
+        # LOD levels add up to about 1/7 of a frame, plus their downsampled copies
+        vdb += vdb // 7 + writers * out_frame // 7
+
+    samples = min(HISTOGRAM_SAMPLE_COUNT, out_count * frames) * sample_channels * 4 * layers
+
+    return int(source + prepared + smooth_temp + resized + queued + vdb + samples)
+
+
+def fits_in_memory(peak: int, available: int) -> bool:
+    """Whether an estimated peak fits the share of available memory an import may use."""
+    return available <= 0 or peak <= available * MEMORY_HEADROOM
+
+
+def get_memory_fit_bioxel_size(orig_shape: tuple, orig_spacing: tuple,
+                               frame_count: int, channel_count: int, itemsize: int,
+                               config: dict, budget: int):
+    """Smallest bioxel size whose import fits in budget, None if none does."""
+    def fits(bioxel_size):
+        layer_shape = get_layer_shape(bioxel_size, orig_shape, orig_spacing)
+        return estimate_import_memory(orig_shape, layer_shape, frame_count, channel_count,
+                                      itemsize, config) <= budget
+
+    high = max(orig_shape[i] * orig_spacing[i] for i in range(3))
+    if not fits(high):
+        # the parsed source alone does not fit
+        return None
+
+    low = min(orig_spacing) / 4
+    if fits(low):
+        return low
+    for _ in range(32):
+        middle = (low + high) / 2
+        if fits(middle):
+            high = middle
+        else:
+            low = middle
+    return high
+
+
+def get_native_affine(affine, orig_spacing: tuple):
+    """Affine mapping source voxel indices to bioxel space, spacing included."""
+    mat_scale = np.diag([*orig_spacing, 1.0])
+    return np.dot(affine, mat_scale)
+
+
+def get_source_fingerprint(filepath: str, series_id: str):
+    from .parse import DICOM_EXTS, SEQUENCE_EXTS, get_ext
+
+    data_path = Path(filepath).resolve()
+    stat = data_path.stat()
+    fingerprint = {
+        "path": str(data_path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+        "series_id": series_id,
+    }
+
+    # series and sequences span the whole folder
+    if get_ext(data_path) in DICOM_EXTS + SEQUENCE_EXTS:
+        fingerprint["dir_mtime"] = data_path.parent.stat().st_mtime_ns
+
+    return fingerprint
+
+
+def get_import_key(config):
+    """Content address of an import, same source and settings give the same key."""
+    params = {
+        "source": get_source_fingerprint(config["filepath"], config["series_id"]),
+        "layer_name": config["layer_name"],
+        "read_as": config["read_as"],
+        "bioxel_size": round(float(config["bioxel_size"]), 6),
+        "resample": config.get("resample", True),
+        "orig_spacing": [round(float(s), 6) for s in config["orig_spacing"]],
+        "frame_source": config["frame_source"],
+        "smooth": config["smooth"],
+        "remap": config["remap"],
+        "split_channel": config["split_channel"],
+        "lod_count": config.get("lod_count", 0),
+    }
+    text = json.dumps(params, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+# frame buffers kept between layers and jobs of a persistent worker, by shape,
+# a buffer is lent to one thread at a time so pipeline writers never share one
+_scratch_buffers = OrderedDict()
+_scratch_lock = threading.Lock()
+
+
+@contextmanager
+def scratch_buffer(shape: tuple):
+    """
+    Lend a float32 buffer of the given shape, returned to the pool afterwards.
+
+    - Full frames and every LOD level keep their own buffers.
+    - At most SCRATCH_BUFFER_COUNT idle buffers are kept, least recently
+      used shapes go first.
+    """
+    shape = tuple(int(n) for n in shape)
+    with _scratch_lock:
+        idle = _scratch_buffers.get(shape)
+        buffer = idle.pop() if idle else None
+    if buffer is None:
+        buffer = np.empty(shape, dtype=np.float32)
+
+    try:
+        yield buffer
+    finally:
+        with _scratch_lock:
+            _scratch_buffers.setdefault(shape, []).append(buffer)
+            _scratch_buffers.move_to_end(shape)
+            while sum(len(idle) for idle in _scratch_buffers.values()) > SCRATCH_BUFFER_COUNT:
+                oldest = next(iter(_scratch_buffers))
+                _scratch_buffers[oldest].pop(0)
+                if not _scratch_buffers[oldest]:
+                    del _scratch_buffers[oldest]
+
+
+def get_layer_offset(layer: Layer) -> float:
+    """
+    Offset that makes the channel collapsed scalar layer non-negative.
+
+    Computed frame by frame so no full-volume temporary is allocated.
+    """
+    if layer.kind not in ["scalar"]:
+        return 0.0
+
+    if layer.channel_count == 1:
+        orig_min = float(np.min(layer.data))
+    else:
+        orig_min = None
+        with scratch_buffer(layer.shape) as scratch:
+            for f in range(layer.frame_count):
+                np.maximum.reduce(layer.data[f], axis=-1, out=scratch)
+                frame_min = float(scratch.min())
+                orig_min = frame_min if orig_min is None else min(orig_min, frame_min)
+
+    return -orig_min if orig_min < 0 else 0.0
+
+
+def cache_layer_data(layer: Layer, cache_path: str):
+    """
+    Cache the given Layer's data as one or more VDB files.
+
+    - For multi-frame layers, writes per-frame VDB files named data.0001.vdb, data.0002.vdb, ...
+    - For single-frame layers, writes a single data.vdb file.
+    - Applies basic type handling:
+      - label/scalar layers collapse channel dimension via max.
+      - scalar layers are offset to avoid negative values.
+    - Frames are prepared one at a time in a single reused float32 buffer, channel collapse,
+      offset and cast are done in place, so peak memory is about one frame plus the source.
+    - The VDB grids will have their transform set from layer.affine but no additional metadata is written.
+
+    Parameters:
+    - layer: Layer object containing ndarray data and metadata.
+    - cache_path: directory path where VDB files will be written (created if missing).
+    """
+    # 标量类型偏移处理（避免负值）
+    offset = get_layer_offset(layer)
+
+    # 创建缓存目录
+    cache_path = Path(cache_path)
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    for f in range(layer.frame_count):
+        write_vdb_frame(
+            layer.data[f, :, :, :, :],
+            layer.kind,
+            layer.affine,
+            get_vdb_filepath(cache_path, f, layer.frame_count),
+            offset,
+        )
+
+
+def get_vdb_filepath(cache_path: Path, frame: int, frame_count: int) -> Path:
+    # 多帧保存为序列帧VDB，单帧保存为 data.vdb
+    if frame_count > 1:
+        return cache_path / f"data.{str(frame+1).zfill(4)}.vdb"
+    return cache_path / "data.vdb"
+
+
+def write_vdb_frame(frame: np.ndarray, kind: str, affine, filepath: Path, offset: float = 0.0):
+    """
+    Write one XYZC frame as a VDB grid, prepared in a reused float32 buffer.
+
+    - label/scalar frames collapse the channel dimension via max, color frames keep 3 channels.
+    - offset is added in place to keep scalar values non-negative.
+    """
+    is_scalar_grid = kind in ["label", "scalar"]
+
+    # 每帧复用同一个 float32 缓冲区
+    shape = frame.shape[:3] if is_scalar_grid else (*frame.shape[:3], 3)
+    grid = vdb.FloatGrid() if is_scalar_grid else vdb.Vec3SGrid()
+    with scratch_buffer(shape) as scratch:
+        if is_scalar_grid:
+            # 去除通道维度
+            np.maximum.reduce(frame, axis=-1, out=scratch)
+        else:  # 颜色类型
+            np.copyto(scratch, frame[:, :, :, :3], casting="unsafe")
+
+        if offset:
+            scratch += offset
+
+        # 根据图层类型创建VDB网格，仅设置transform，不存储metadata
+        grid.copyFromArray(scratch)
+    grid.transform = vdb.createLinearTransform(np.asarray(affine).transpose())
+    grid.name = kind
+    vdb.write(str(filepath), grids=[grid])
+
+
+def cache_layer_snapshot(layer: Layer, cache_path: str):
+    """
+    Create and save a low-resolution snapshot (numpy .npy) of the layer and its histogram.
+
+    - Saves a 4D numpy ndarray snapshot (XYZC) to <cache_path>/snapshot.npy,
+      slice previews are rendered from it when the UI asks for them.
+    - Draws the value histogram of scalar and color layers to histogram.png.
+
+    Parameters:
+    - layer: Layer to snapshot (expects Layer.snapshot method).
+    - cache_path: destination directory where snapshot.npy and histogram.png will be created.
+
+    Returns:
+    - (snapshot window, histogram), the histogram (range and bin counts) is None for labels.
+    """
+    window = save_snapshot(layer.snapshot(SNAPSHOT_SHAPE), layer.kind, cache_path)
+    if layer.kind not in ["scalar", "vector", "color"]:
+        return window, None
+
+    per_frame = max(1, HISTOGRAM_SAMPLE_COUNT // layer.frame_count)
+    samples = np.concatenate([
+        get_histogram_samples(layer.data[f], layer.kind, per_frame)
+        for f in range(layer.frame_count)
+    ])
+    return window, save_histogram(samples, layer.kind, cache_path)
+
+
+def save_snapshot(snapshot: np.ndarray, kind: str, cache_path: str):
+    """
+    Save snapshot.npy, slice previews are rendered from it on demand.
+
+    Returns the display window of the snapshot (see get_snapshot_window).
+    """
+    cache_path = Path(cache_path)
+    cache_path.mkdir(parents=True, exist_ok=True)
+
+    np.save(str(cache_path / "snapshot.npy"), snapshot)
+    return get_snapshot_window(snapshot, kind)
+
+
+def get_histogram_samples(frame: np.ndarray, kind: str, max_count: int) -> np.ndarray:
+    """Regular subsample of an XYZC frame as (N, C) float32 values, at most about max_count."""
+    channel_count = 1 if kind == "scalar" else 3
+    voxel_count = frame.shape[0] * frame.shape[1] * frame.shape[2]
+    step = max(1, math.ceil((voxel_count / max(1, max_count)) ** (1 / 3)))
+    samples = frame[::step, ::step, ::step, :channel_count]
+    return samples.reshape(-1, channel_count).astype(np.float32)
+
+
+def compute_histogram(samples: np.ndarray, bins: int = HISTOGRAM_BINS) -> Dict[str, Any]:
+    """
+    Bin (N, C) value samples on one shared value range.
+
+    - The range is the 1st~99th percentile of each channel, read from a
+      strided subsample of at most HISTOGRAM_BOUND_SAMPLES values, so no
+      full sort of the samples.
+    - Returns {"range": [min, max], "counts": [[...] per channel]}.
+    """
+    lows, highs, channels = [], [], []
+    for c in range(samples.shape[1]):
+        values = samples[:, c]
+        values = values[np.isfinite(values)]
+        channels.append(values)
+        if values.size == 0:
+            continue
+        step = max(1, values.size // HISTOGRAM_BOUND_SAMPLES)
+        low, high = np.percentile(values[::step], [1, 99])
+        lows.append(float(low))
+        highs.append(float(high))
+
+    low = min(lows) if lows else 0.0
+    high = max(highs) if highs else 1.0
+    if high <= low:
+        high = low + 1.0
+
+    counts = [
+        np.histogram(values, bins=bins, range=(low, high))[0].tolist()
+        for values in channels
+    ]
+    return {"range": [low, high], "counts": counts}
+
+
+def render_histogram(histogram: Dict[str, Any], kind: str,
+                     size: int = HISTOGRAM_IMAGE_SIZE) -> np.ndarray:
+    """
+    Rasterize log scaled histogram curves with a light fill, returns (H, W, 3) in 0~1.
+
+    Scalar is drawn in black, color channels in red, green and blue.
+    """
+    colors = HISTOGRAM_COLORS["scalar" if kind == "scalar" else "color"]
+    image = np.ones((size, size, 3), dtype=np.float32)
+    margin = size // 16
+    width = size - margin * 2
+    rows = np.arange(size, dtype=np.float32)[:, None]
+
+    # log scale from the smallest non-empty bin, empty bins sit on the baseline
+    counts = [np.asarray(c, dtype=np.float32) for c in histogram["counts"]]
+    nonzero = [float(c[c > 0].min()) for c in counts if np.any(c > 0)]
+    floor = np.log(min(nonzero)) - 0.5 if nonzero else 0.0
+    counts = [np.maximum(np.log(np.maximum(c, 1e-6)) - floor, 0.0) for c in counts]
+    peak = max((float(c.max()) for c in counts if c.size), default=0.0) or 1.0
+    thickness = max(1.0, size / 128)
+
+    for channel_counts, color in zip(counts, colors):
+        if channel_counts.size == 0:
+            continue
+        color = np.asarray(color, dtype=np.float32)
+        centers = np.linspace(margin, margin + width - 1, channel_counts.size)
+        columns = np.arange(size, dtype=np.float32)
+        heights = np.interp(columns, centers, channel_counts / peak * (size - margin * 2))
+        inside = (columns >= margin) & (columns <= margin + width - 1)
+        tops = size - margin - heights
+
+        # line spans to the neighbour midpoints so steep segments stay connected
+        prev_tops = np.concatenate(([tops[0]], tops[:-1]))
+        next_tops = np.concatenate((tops[1:], [tops[-1]]))
+        line_low = np.minimum.reduce([tops, (tops + prev_tops) / 2, (tops + next_tops) / 2])
+        line_high = np.maximum.reduce([tops, (tops + prev_tops) / 2, (tops + next_tops) / 2])
+
+        fill = (rows >= tops) & (rows < size - margin) & inside
+        line = (rows >= line_low - thickness) & (rows <= line_high + thickness) & inside
+        image[fill] = image[fill] * 0.9 + color * 0.1
+        image[line] = color
+
+    return image
+
+
+def save_histogram(samples: np.ndarray, kind: str, cache_path: str) -> Dict[str, Any]:
+    """
+    Bin (N, C) value samples and draw histogram.png, channel 0 for scalar, 0~2 for color.
+
+    Returns the histogram (range and bin counts) to keep in the cache info.
+    """
+    if kind not in ["scalar", "vector", "color"]:
+        return None
+
+    histogram = compute_histogram(samples)
+    write_png(render_histogram(histogram, kind), str(Path(cache_path) / "histogram.png"))
+    return histogram
+
+
+def write_png(array: np.ndarray, save_path: str):
+    """
+    Write a (W, H, 1) or (W, H, 3) slice with values in 0~1 as an 8-bit RGB PNG.
+
+    The first row of the array is the top row of the image. Encoded with
+    zlib only, no Blender image needed.
+    """
+    import zlib
+
+    if array.ndim == 2:
+        array = array[:, :, None]
+    if array.shape[2] == 1:
+        array = np.repeat(array, 3, axis=2)
+    else:
+        array = array[:, :, :3]
+
+    pixels = np.clip(np.nan_to_num(array, nan=0.0), 0.0, 1.0)
+    pixels = (pixels * 255 + 0.5).astype(np.uint8)
+    h, w = pixels.shape[0], pixels.shape[1]
+
+    # every scanline starts with filter type 0 (none)
+    raw = np.zeros((h, w * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = pixels.reshape(h, w * 3)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        body = tag + data
+        return struct.pack(">I", len(data)) + body + struct.pack(">I", zlib.crc32(body))
+
+    header = struct.pack(">IIBBBBB", w, h, 8, 2, 0, 0, 0)
+    png = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) \
+        + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)) + chunk(b"IEND", b"")
+    Path(save_path).write_bytes(png)
+
+
+def get_snapshot_window(snapshot: np.ndarray, kind: str):
+    """Display range (min, max) of a snapshot, median to 99th percentile for scalar and vector."""
+    if kind not in ["scalar", "vector"]:
+        return None
+
+    low = float(np.percentile(snapshot, 50))
+    high = float(np.percentile(snapshot, 99))
+    if high - low <= 1e-8:
+        return None
+    return low, high
+
+
+def get_snapshot_slice(snapshot: np.ndarray, zidx: int, window=None) -> np.ndarray:
+    """
+    Z slice of an XYZC snapshot as (X, Y, 3) values in 0~1, ready for write_png.
+
+    - window (min, max) is mapped to 0~1, without it values are clipped.
+    - snapshot may be memory-mapped, only the slice is read.
+    """
+    zidx = min(max(int(zidx), 0), snapshot.shape[2] - 1)
+    array = np.asarray(snapshot[:, :, zidx, :], dtype=np.float32)
+    if window is not None:
+        low, high = window
+        array = (array - low) / (high - low)
+    array = np.clip(np.nan_to_num(array, nan=0.0), 0.0, 1.0)
+
+    if array.shape[2] == 1:
+        return np.repeat(array, 3, axis=2)
+    if array.shape[2] == 2:
+        return np.concatenate((array, np.zeros_like(array[:, :, :1])), axis=2)
+    return array[:, :, :3]
+
+
+def cache_layer_lods(layer: Layer, cache_path: str, lod_count: int) -> List[Dict[str, Any]]:
+    """
+    Write a block-averaged LOD pyramid of the layer next to its full resolution data.
+
+    - Level n is downsampled by 2**n from the full resolution layer, each level built from the previous one.
+    - Each level is written with cache_layer_data into <cache_path>/lod<n>/, so an O Layer node can
+      switch to it by pointing its Path to that folder.
+    - Stops early once the layer is too small to be worth another level.
+
+    Returns:
+    - List of LOD metadata dictionaries ({"level", "dirname", "shape"}).
+    """
+    lods = []
+    cache_path = Path(cache_path)
+    lod_layer = layer
+    for level in range(1, lod_count + 1):
+        if max(lod_layer.shape) < LOD_MIN_SIZE * 2:
+            break
+
+        lod_layer = lod_layer.downsample(2)
+        dirname = get_lod_dirname(level)
+        cache_layer_data(lod_layer, cache_path / dirname)
+        lods.append({
+            "level": level,
+            "dirname": dirname,
+            "shape": lod_layer.shape,
+        })
+
+    return lods
+
+
+def get_lod_dirname(level: int) -> str:
+    return f"lod{level}"
+
+
+def get_lod_path(path: str, level: int) -> str:
+    """Path of the given LOD level folder for a layer cache path (level 0 is the cache itself)."""
+    if level <= 0:
+        return path
+    path = path.rstrip("/\\")
+    return f"{path}/{get_lod_dirname(level)}"
+
+
+def get_cache_id(cache_key: str, idx: int) -> str:
+    return f"{cache_key}_{idx}"
+
+
+def load_layers_from_cache(cache_dir: str, cache_key: str) -> List[Dict[str, Any]]:
+    """
+    Look up a complete set of layer caches previously written for cache_key.
+
+    - Reads <cache_dir>/<cache_key>_<idx>/info.json for every layer of the import.
+    - info.json is written last, so a missing one means the import was never finished.
+    - Paths are refreshed to where the caches are now.
+
+    Returns:
+    - List of layer cache metadata dictionaries, or an empty list if the import is not fully cached.
+    """
+    cache_dir_path = Path(cache_dir)
+    first_info_path = cache_dir_path / get_cache_id(cache_key, 0) / CACHE_INFO_FILENAME
+    try:
+        layer_count = json.loads(first_info_path.read_text(encoding="utf-8"))["layer_count"]
+    except Exception:
+        return []
+
+    cache_infos = []
+    for idx in range(layer_count):
+        cache_path = cache_dir_path / get_cache_id(cache_key, idx)
+        try:
+            cache_info = json.loads((cache_path / CACHE_INFO_FILENAME).read_text(encoding="utf-8"))
+        except Exception:
+            return []
+        cache_info["path"] = str(cache_path)
+        # caches written by older versions kept the whole import profile
+        if "profile" in cache_info:
+            cache_info["profile"] = get_profile_summary(cache_info["profile"])
+        cache_infos.append(cache_info)
+
+    return cache_infos
+
+
+def save_layer_to_cache(layer: Layer, cache_dir: str, cache_id: str, lod_count: int = 0,
+                        layer_count: int = 1) -> Dict[str, Any]:
+    """
+    Save one Layer object into cache_dir/<cache_id>/.
+
+    - Writes VDB files, a low-resolution snapshot (.npy) and, for scalar and
+      color layers, histogram.png. Slice previews are rendered from the
+      snapshot on demand.
+    - Optionally writes lod_count precomputed preview levels under lod<n>/.
+    - Writes the cache metadata to info.json once everything else is written.
+
+    Returns:
+    - The layer cache metadata dictionary.
+    """
+    cache_path = Path(cache_dir) / cache_id
+    cache_layer_data(layer, cache_path)
+    snapshot_window, histogram = cache_layer_snapshot(layer, cache_path)
+    lods = cache_layer_lods(layer, cache_path, lod_count)
+
+    # build layer_info
+    cache_info = {
+        "id": cache_id,
+        "name": layer.name,
+        "kind": layer.kind,
+        "shape": layer.shape,
+        "affine": layer.affine.tolist(),
+        "bioxel_size": layer.bioxel_size[0],
+        "dtype": layer.dtype.str,
+        "dtype_num": layer.dtype.num,
+        "frame_count": layer.frame_count,
+        "channel_count": layer.channel_count,
+        "offset": max(0, -layer.min),
+        "min": layer.min,
+        "max": layer.max,
+        "path": str(cache_path),
+        "snapshot_z": 0.5,
+        "snapshot_window": snapshot_window,
+        "lods": lods,
+        "layer_count": layer_count,
+    }
+    if histogram is not None:
+        cache_info["histogram"] = histogram
+
+    # written last, marks the layer cache as complete
+    (cache_path / CACHE_INFO_FILENAME).write_text(json.dumps(cache_info), encoding="utf-8")
+    return cache_info
+
+
+def save_layers_to_cache(layers: List[Layer], cache_dir: str, lod_count: int = 0,
+                         cache_key: str = "") -> List[Dict[str, Any]]:
+    """
+    Save multiple Layer objects into cache folders.
+
+    For each layer:
+    - Uses <cache_key>_<idx> as cache id, cache_key defaults to a random one.
+    - Saves it with save_layer_to_cache.
+
+    Returns:
+    - List of layer cache metadata dictionaries.
+    """
+    cache_infos = []
+
+    cache_dir_path = Path(cache_dir)
+    cache_dir_path.mkdir(parents=True, exist_ok=True)
+
+    cache_key = cache_key or uuid.uuid4().hex[:16]
+    for idx, layer in enumerate(layers):
+        cache_info = save_layer_to_cache(
+            layer,
+            cache_dir_path,
+            get_cache_id(cache_key, idx),
+            lod_count=lod_count,
+            layer_count=len(layers),
+        )
+        cache_infos.append(cache_info)
+
+    return cache_infos
+
+
+class LayerCacheWriter:
+    """
+    Write a layer cache one frame at a time, the sink of a streaming import.
+
+    VDB frames and LOD levels are written as frames arrive, the snapshot is
+    taken from the first frame and value statistics plus histogram samples
+    are accumulated, info.json is written by finish. Stages are recorded to
+    profile (ImportProfile) when given.
+    """
+
+    def __init__(self, cache_path: str, name: str, kind: str, affine,
+                 frame_count: int, offset: float = 0.0, lod_count: int = 0,
+                 profile=None):
+        self.cache_path = Path(cache_path)
+        self.cache_path.mkdir(parents=True, exist_ok=True)
+        self.name = name
+        self.kind = kind
+        self.affine = np.asarray(affine)
+        self.frame_count = frame_count
+        self.offset = offset
+        self.lod_count = lod_count
+        self.profile = profile
+
+        self.shape = None
+        self.dtype = None
+        self.channel_count = 1
+        self.min = None
+        self.max = None
+        self.lods = []
+        self.samples = []
+        self.histogram = None
+        self.snapshot_window = None
+
+    def write_frame(self, f: int, frame: np.ndarray):
+        if self.shape is None:
+            self.shape = tuple(int(n) for n in frame.shape[:3])
+            self.dtype = frame.dtype
+            self.channel_count = frame.shape[3]
+
+        frame_min, frame_max = float(np.min(frame)), float(np.max(frame))
+        self.min = frame_min if self.min is None else min(self.min, frame_min)
+        self.max = frame_max if self.max is None else max(self.max, frame_max)
+
+        with profile_stage(self.profile, "write_vdb") as stage:
+            filepath = get_vdb_filepath(self.cache_path, f, self.frame_count)
+            write_vdb_frame(frame, self.kind, self.affine, filepath, self.offset)
+            stage.bytes_written += get_path_size(filepath)
+
+        frame_layer = Layer(data=frame[np.newaxis], name=self.name,
+                            kind=self.kind, affine=self.affine)
+        if f == 0:
+            with profile_stage(self.profile, "snapshot") as stage:
+                self.snapshot_window = save_snapshot(frame_layer.snapshot(SNAPSHOT_SHAPE),
+                                                     self.kind, self.cache_path)
+                stage.bytes_written += sum(get_path_size(filepath)
+                                           for filepath in self.cache_path.glob("snapshot*"))
+
+        if self.kind in ["scalar", "vector", "color"]:
+            with profile_stage(self.profile, "histogram"):
+                self.add_samples(frame)
+
+        with profile_stage(self.profile, "lods") as stage:
+            stage.bytes_written += self.write_lods(f, frame_layer)
+
+    def add_samples(self, frame: np.ndarray):
+        # a regular subsample, spread over frames
+        per_frame = max(1, HISTOGRAM_SAMPLE_COUNT // self.frame_count)
+        self.samples.append(get_histogram_samples(frame, self.kind, per_frame))
+
+    def write_lods(self, f: int, frame_layer: Layer) -> int:
+        """Write LOD levels of a frame, returns the bytes written."""
+        bytes_written = 0
+        lod_layer = frame_layer
+        for level in range(1, self.lod_count + 1):
+            if max(lod_layer.shape) < LOD_MIN_SIZE * 2:
+                break
+
+            lod_layer = lod_layer.downsample(2)
+            dirname = get_lod_dirname(level)
+            lod_path = self.cache_path / dirname
+            lod_path.mkdir(parents=True, exist_ok=True)
+            filepath = get_vdb_filepath(lod_path, f, self.frame_count)
+            write_vdb_frame(lod_layer.data[0], self.kind, lod_layer.affine, filepath, self.offset)
+            bytes_written += get_path_size(filepath)
+            if f == 0:
+                self.lods.append({
+                    "level": level,
+                    "dirname": dirname,
+                    "shape": lod_layer.shape,
+                })
+        return bytes_written
+
+    def write_histogram(self):
+        if not self.samples:
+            return
+        with profile_stage(self.profile, "histogram") as stage:
+            self.histogram = save_histogram(np.concatenate(self.samples), self.kind,
+                                            self.cache_path)
+            stage.bytes_written += get_path_size(self.cache_path / "histogram.png")
+        self.samples = []
+
+    def finish(self, cache_id: str, layer_count: int = 1,
+               profile: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Write info.json, profile is the small summary of get_profile_summary."""
+        self.write_histogram()
+
+        t, r, z, _ = transforms3d.affines.decompose44(self.affine)
+        cache_info = {
+            "id": cache_id,
+            "name": self.name,
+            "kind": self.kind,
+            "shape": self.shape,
+            "affine": self.affine.tolist(),
+            "bioxel_size": float(z[0]),
+            "dtype": self.dtype.str,
+            "dtype_num": self.dtype.num,
+            "frame_count": self.frame_count,
+            "channel_count": self.channel_count,
+            "offset": self.offset,
+            "min": self.min,
+            "max": self.max,
+            "path": str(self.cache_path),
+            "snapshot_z": 0.5,
+            "snapshot_window": self.snapshot_window,
+            "lods": self.lods,
+            "layer_count": layer_count,
+        }
+        if self.histogram is not None:
+            cache_info["histogram"] = self.histogram
+        if profile is not None:
+            cache_info["profile"] = profile
+
+        # written last, marks the layer cache as complete
+        (self.cache_path / CACHE_INFO_FILENAME).write_text(json.dumps(cache_info), encoding="utf-8")
+        return cache_info
+
+
+def make_progress_writer(reporter, scale=1.0, offset=0.0):
+    def progress_callback(factor, text):
+        reporter.report(offset + factor * scale, text)
+
+    return progress_callback
+
+
+def read_meta(config, reporter):
+    from .parse import parse_volumetric_data
+
+    progress_callback = make_progress_writer(reporter)
+    series_id = config["series_id"] if config["series_id"] != "empty" else ""
+    data, meta = parse_volumetric_data(
+        data_file=config["filepath"],
+        series_id=series_id,
+        progress_callback=progress_callback,
+    )
+    reporter.check_cancel()
+    return {
+        "meta": {
+            **meta,
+            "spacing": [float(s) for s in meta["spacing"]],
+            "affine": meta["affine"].tolist(),
+            "xyz_shape": list(meta["xyz_shape"]),
+        },
+        "label_count": int(np.max(data)),
+        "dtype": data.dtype.str,
+        "dtype_kind": data.dtype.kind,
+    }
+
+
+def read_series(config, reporter):
+    import SimpleITK as sitk
+
+    reporter.report(0.0, "Collecting DICOM Series...", force=True)
+    data_dirpath = Path(config["filepath"]).resolve().parent
+    reader = sitk.ImageSeriesReader()
+    reader.MetaDataDictionaryArrayUpdateOn()
+    reader.LoadPrivateTagsOn()
+
+    series_ids = reader.GetGDCMSeriesIDs(str(data_dirpath))
+    series_items = {}
+
+    for i, series_id in enumerate(series_ids):
+        reporter.report(i / len(series_ids), f"Reading Series {i+1}...")
+        series_files = reader.GetGDCMSeriesFileNames(
+            str(data_dirpath), series_id
+        )
+        single = sitk.ImageFileReader()
+        single.SetFileName(series_files[0])
+        single.LoadPrivateTagsOn()
+        single.ReadImageInformation()
+
+        def get_meta(key):
+            try:
+                stirng = single.GetMetaData(key).removesuffix(" ")
+                stirng.encode("utf-8")
+                if stirng in [
+                    "No study description",
+                    "No series description",
+                    "",
+                ]:
+                    return "Unknown"
+                else:
+                    return stirng
+            except:
+                return "Unknown"
+
+        study_description = get_meta("0008|1030")
+        series_description = get_meta("0008|103e")
+        series_modality = get_meta("0008|0060")
+        size_x = get_meta("0028|0011")
+        size_y = get_meta("0028|0010")
+        count = get_meta("0020|0013")
+        count = count if count != "Unknown" else 1
+
+        # some series image count = 0 ????
+        if int(count) == 0:
+            continue
+
+        # series_id cannot be "" in blender selection
+        if series_id == "":
+            series_id = "empty"
+
+        label = "{:<20} {:>1}".format(
+            f"{study_description}>{series_description}({series_modality})",
+            f"({size_x}x{size_y})x{count}",
+        )
+
+        series_items[series_id] = label
+
+    reporter.check_cancel()
+    return {
+        "series": [
+            {"id": series_id, "label": label}
+            for series_id, label in series_items.items()
+        ]
+    }
+
+
+def fit_import_memory(config, source_shape, dtype, shape, label_count, orig_spacing):
+    """
+    Settings of an import adjusted to the available memory, run once the source is parsed.
+
+    - source_shape (TXYZC) and shape (XYZ) are taken before frame_source.
+    - The parsed source is already loaded, so it is left out of the estimate.
+    - Imports that do not fit fall back to serial frames (queue_depth 0),
+      then to no LOD levels. When even that does not fit, the import is
+      still tried with the cheapest settings.
+    """
+    available = get_available_memory()
+    if available <= 0:
+        return config
+
+    frame_count = source_shape[0]
+    channel_count = source_shape[4]
+    orig_shape = source_shape[1:4]
+    itemsize = np.dtype(dtype).itemsize
+
+    candidates = [
+        config,
+        {**config, "queue_depth": 0},
+        {**config, "queue_depth": 0, "lod_count": 0},
+    ]
+    for candidate in candidates:
+        peak = estimate_import_memory(orig_shape, shape, frame_count, channel_count,
+                                      itemsize, {**candidate, "label_count": label_count},
+                                      include_source=False)
+        if fits_in_memory(peak, available):
+            break
+
+    if candidate is not config:
+        print(f"Low memory, import with queue_depth {candidate['queue_depth']} "
+              f"and lod_count {candidate.get('lod_count', 0)}")
+    if not fits_in_memory(peak, available):
+        message = f"Import may run out of memory, it needs about {peak / 1024**3:.2f} GB " \
+            f"of the {available * MEMORY_HEADROOM / 1024**3:.2f} GB it may use."
+        bioxel_size = get_memory_fit_bioxel_size(
+            orig_shape, orig_spacing, frame_count, channel_count, itemsize,
+            {**candidate, "label_count": label_count}, available * MEMORY_HEADROOM)
+        if bioxel_size is not None:
+            message += f" A bioxel size of at least {bioxel_size:.2f} would fit."
+        print(message)
+    return candidate
+
+
+def build_layers(config, reporter):
+    """
+    Import a source into layer caches with the streaming engine.
+
+    Every frame is prepared, resampled and written to VDB for all layers
+    before the next one, so only the parsed source and one frame per layer
+    are in memory.
+
+    Stage timings go to the "profile" of the result, with config["trace_path"]
+    set they are also saved as a Chrome trace. Cache infos only keep the
+    wall time and peak memory, they end up in the blend file.
+    """
+    from .parse import parse_volumetric_data
+    from .stream import get_stream_layers, stream_layers, transform_frame_source
+
+    profile = ImportProfile()
+    cache_key = get_import_key(config)
+    with profile_stage(profile, "load_cache"):
+        cache_infos = load_layers_from_cache(config["cache_dir"], cache_key)
+    if cache_infos:
+        print(f"Found cached layers for import {cache_key}, skip processing")
+        return {
+            "cache_infos": cache_infos,
+            "added_ids": [item["id"] for item in cache_infos],
+            "profile": finish_profile(profile, config),
+        }
+
+    reporter.report(0.0, "Parsing Volumetirc Data...", force=True)
+    progress_callback = make_progress_writer(reporter, scale=0.2)
+    with profile_stage(profile, "parse") as stage:
+        data, meta = parse_volumetric_data(
+            data_file=config["filepath"],
+            series_id=config["series_id"],
+            progress_callback=progress_callback,
+        )
+        stage.bytes_read += get_source_size(config["filepath"])
+
+    reporter.check_cancel()
+    orig_shape = tuple(config["orig_shape"])
+    orig_spacing = tuple(config["orig_spacing"])
+
+    if config.get("resample", True):
+        bioxel_size = config["bioxel_size"]
+    elif orig_shape[0] * orig_shape[1] * orig_shape[2] > MAX_BIOXEL_COUNT:
+        # native voxels do not fit the budget, fall back to resampling
+        bioxel_size = get_fit_bioxel_size(orig_shape, orig_spacing, MAX_BIOXEL_COUNT)
+        print(f"Too many voxels for native import, resample to bioxel size {bioxel_size:.4f}")
+    else:
+        bioxel_size = None
+
+    if bioxel_size is None:
+        # keep source voxels, encode spacing in the transform instead
+        shape = orig_shape
+        affine = get_native_affine(meta["affine"], orig_spacing)
+    else:
+        shape = get_layer_shape(bioxel_size, orig_shape, orig_spacing)
+        mat_scale = transforms3d.zooms.zfdir2aff(bioxel_size)
+        affine = np.dot(meta["affine"], mat_scale)
+    kind = config["read_as"].lower()
+
+    source_shape, layer_shape = data.shape, shape
+    data, shape = transform_frame_source(data, shape, config["frame_source"])
+    # counted after frame_source like Data.to_layers, "-1" keeps the first frame only
+    with profile_stage(profile, "statistics"):
+        label_count = int(np.max(data)) if kind == "label" else 1
+    lod_count = config.get("lod_count", 0)
+    config = fit_import_memory(config, source_shape, data.dtype, layer_shape, label_count,
+                               orig_spacing)
+    if config.get("lod_count", 0) != lod_count:
+        # caches without the requested LOD levels must not answer later imports
+        cache_key = get_import_key(config)
+
+    reporter.check_cancel()
+    default_name = {"label": "Label", "color": "Color", "scalar": "Scalar"}[kind]
+    with profile_stage(profile, "statistics"):
+        layers = get_stream_layers(
+            data,
+            kind,
+            config["layer_name"] or default_name,
+            remap=config["remap"],
+            split_channel=config["split_channel"],
+            label_count=label_count,
+        )
+
+    cache_dir_path = Path(config["cache_dir"])
+    writers = [
+        LayerCacheWriter(
+            cache_dir_path / get_cache_id(cache_key, idx),
+            layer.name,
+            layer.kind,
+            affine,
+            data.shape[0],
+            offset=layer.offset,
+            lod_count=config.get("lod_count", 0),
+            profile=profile,
+        )
+        for idx, layer in enumerate(layers)
+    ]
+
+    def sink(layer_index, frame_index, frame):
+        reporter.check_cancel()
+        writers[layer_index].write_frame(frame_index, frame)
+
+    def progress_callback(frame, total):
+        text = f"Processing Frame {frame+1}/{total}..."
+        reporter.report(0.2 + 0.75 * frame / total, text)
+        print(text)
+
+    smooth = config["smooth"] if kind == "label" else 0
+    stream_layers(data, layers, shape, sink, smooth=smooth,
+                  progress_callback=progress_callback,
+                  queue_depth=config.get("queue_depth", PIPELINE_DEPTH),
+                  writer_count=PIPELINE_WRITERS,
+                  profile=profile)
+
+    reporter.check_cancel()
+    reporter.report(0.95, "Creating Layers...", force=True)
+    for writer in writers:
+        writer.write_histogram()
+
+    profile_info = finish_profile(profile, config)
+    cache_infos = [
+        writer.finish(get_cache_id(cache_key, idx), layer_count=len(writers),
+                      profile=get_profile_summary(profile_info))
+        for idx, writer in enumerate(writers)
+    ]
+    return {
+        "cache_infos": cache_infos,
+        "added_ids": [item["id"] for item in cache_infos],
+        "profile": profile_info,
+    }
+
+
+def get_source_size(filepath: str) -> int:
+    """Bytes of a source on disk, the whole folder for DICOM series and sequences."""
+    from .parse import DICOM_EXTS, SEQUENCE_EXTS, get_ext
+
+    data_path = Path(filepath)
+    if get_ext(data_path) in DICOM_EXTS + SEQUENCE_EXTS:
+        return get_path_size(data_path.parent)
+    return get_path_size(data_path)
+
+
+def get_profile_summary(profile_info: Dict[str, Any]) -> Dict[str, Any]:
+    """Wall time and peak memory of an import profile, stored per layer."""
+    return {key: profile_info[key] for key in ("wall", "peak_rss") if key in profile_info}
+
+
+def finish_profile(profile: ImportProfile, config) -> Dict[str, Any]:
+    """Summarize the profile and save the Chrome trace when asked for."""
+    profile_info = profile.to_dict()
+    trace_path = config.get("trace_path")
+    if trace_path:
+        profile.save_trace(trace_path)
+        profile_info["trace_path"] = str(trace_path)
+    return profile_info
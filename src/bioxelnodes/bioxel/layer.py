@@ -115,6 +115,16 @@ class Layer():
         #     dtype = data.dtype
         # data = data.astype(np.float32)
 
+        factors = np.divide(self.shape, shape)
+        zoom_factors = [1 / f for f in factors]
+        # same shape and no smoothing, keep the source voxels untouched
+        is_native = tuple(shape) == tuple(self.shape)
+        if is_native and smooth <= 0:
+            if progress_callback:
+                for f in range(self.frame_count):
+                    progress_callback(f, self.frame_count)
+            return
+
         data_frames = ()
         for f in range(self.frame_count):
             if progress_callback:
@@ -126,14 +136,13 @@ class Layer():
                                           mode="nearest",
                                           size=smooth)
 
-            factors = np.divide(self.shape, shape)
-            zoom_factors = [1 / f for f in factors]
-            order = 0 if frame.dtype == bool else 1
-            frame = ndi.zoom(frame,
-                             zoom_factors+[1.0],
-                             mode="nearest",
-                             grid_mode=False,
-                             order=order)
+            if not is_native:
+                order = 0 if frame.dtype == bool else 1
+                frame = ndi.zoom(frame,
+                                 zoom_factors+[1.0],
+                                 mode="nearest",
+                                 grid_mode=False,
+                                 order=order)
             if smooth > 0:
                 frame = frame.astype(self.dtype)
             data_frames += (frame,)
@@ -152,6 +161,32 @@ class Layer():
         mat_scale = transforms3d.zooms.zfdir2aff(factors[0])
         self.affine = np.dot(self.affine, mat_scale)
 
+    def downsample(self, factor: int = 2):
+        """Block average by an integer factor, returns a new layer."""
+        if factor < 2:
+            return self.copy()
+
+        frames = ()
+        for f in range(self.frame_count):
+            frame = self.data[f, :, :, :, :]
+            # pad with edge so every axis is divisible by factor
+            pad = [(0, -n % factor) for n in frame.shape[:3]] + [(0, 0)]
+            if any(p[1] for p in pad):
+                frame = np.pad(frame, pad, mode="edge")
+
+            x, y, z, c = frame.shape
+            frame = frame.reshape(x // factor, factor,
+                                  y // factor, factor,
+                                  z // factor, factor, c)
+            frame = frame.mean(axis=(1, 3, 5), dtype=np.float32)
+            frames += (frame,)
+
+        mat_scale = transforms3d.zooms.zfdir2aff(factor)
+        return Layer(data=np.stack(frames),
+                     name=self.name,
+                     kind=self.kind,
+                     affine=np.dot(self.affine, mat_scale))
+
     def snapshot(self, shape: tuple, smooth: int = 0):
         if len(shape) != 3:
             raise Exception("Shape must be 3 dim")
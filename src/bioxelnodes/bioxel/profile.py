@@ -0,0 +1,183 @@
+"""
+Per-stage timing and memory records of an import.
+
+Stages may run in several threads (see stream.FramePipeline), records are
+merged under a lock. The summary goes into result.json and the layer cache
+info, the raw events can be saved as a Chrome trace (chrome://tracing or
+Perfetto).
+"""
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict
+
+
+def get_peak_rss() -> int:
+    """Peak resident memory of this process in bytes, 0 when unknown."""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # kilobytes on Linux, bytes on macOS
+        return int(peak) if sys.platform == "darwin" else int(peak) * 1024
+    except ImportError:
+        pass
+
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [
+                    ("cb", wintypes.DWORD),
+                    ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t),
+                    ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t),
+                    ("PeakPagefileUsage", ctypes.c_size_t),
+                ]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if ctypes.windll.psapi.GetProcessMemoryInfo(
+                    process, ctypes.byref(counters), counters.cb):
+                return int(counters.PeakWorkingSetSize)
+        except Exception:
+            pass
+    return 0
+
+
+def get_path_size(path) -> int:
+    """Size of a file, or of all files under a folder."""
+    path = Path(path)
+    try:
+        if path.is_file():
+            return path.stat().st_size
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    except OSError:
+        return 0
+
+
+class StageRecord:
+    """One run of a stage, bytes are added by the code inside the stage."""
+
+    def __init__(self):
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+
+class ImportProfile:
+    """
+    Collect per-stage wall time, CPU time, bytes read/written and peak RSS.
+
+    - stage(name) is a context manager, a stage entered many times (per
+      frame, per layer) is summed up.
+    - CPU time is the time of the thread running the stage.
+    - Peak RSS is the process peak when the stage ends, the persistent
+      worker keeps its peak from earlier jobs.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.start_cpu = time.process_time()
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.events = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        record = StageRecord()
+        start = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield record
+        finally:
+            end = time.perf_counter()
+            cpu = time.thread_time() - start_cpu
+            self.add(name, start, end, cpu, record)
+
+    def add(self, name: str, start: float, end: float, cpu: float, record: StageRecord):
+        peak_rss = get_peak_rss()
+        with self.lock:
+            stage = self.stages.setdefault(name, {
+                "count": 0,
+                "wall": 0.0,
+                "cpu": 0.0,
+                "bytes_read": 0,
+                "bytes_written": 0,
+                "peak_rss": 0,
+            })
+            stage["count"] += 1
+            stage["wall"] += end - start
+            stage["cpu"] += cpu
+            stage["bytes_read"] += record.bytes_read
+            stage["bytes_written"] += record.bytes_written
+            stage["peak_rss"] = max(stage["peak_rss"], peak_rss)
+
+            self.events.append({
+                "name": name,
+                "ph": "X",
+                "ts": (start - self.start) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {
+                    "bytes_read": record.bytes_read,
+                    "bytes_written": record.bytes_written,
+                },
+            })
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            stages = [{"name": name, **stage} for name, stage in self.stages.items()]
+        return {
+            "wall": time.perf_counter() - self.start,
+            "cpu": time.process_time() - self.start_cpu,
+            "peak_rss": get_peak_rss(),
+            "bytes_read": sum(stage["bytes_read"] for stage in stages),
+            "bytes_written": sum(stage["bytes_written"] for stage in stages),
+            "stages": stages,
+        }
+
+    def save_trace(self, trace_path: str):
+        """Write recorded stages as Chrome trace events."""
+        with self.lock:
+            events = list(self.events)
+
+        thread_names = {}
+        for event in events:
+            thread_names.setdefault(event["tid"], f"Thread {len(thread_names)}")
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in thread_names.items()
+        ]
+
+        trace_path = Path(trace_path)
+        trace_path.parent.mkdir(parents=True, exist_ok=True)
+        trace_path.write_text(
+            json.dumps({"traceEvents": metadata + events, "displayTimeUnit": "ms"}),
+            encoding="utf-8",
+        )
+
+
+def profile_stage(profile, name: str):
+    """profile.stage(name), or a no-op stage when profile is None."""
+    if profile is None:
+        return nullcontext(StageRecord())
+    return profile.stage(name)
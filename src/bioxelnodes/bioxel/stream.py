@@ -0,0 +1,290 @@
+"""
+Frame by frame layer processing shared by every import entry point.
+
+A source frame goes through prepare (kind conversion, label mask, channel
+split) and resample, then is handed to a sink before the next frame is
+touched, so temporaries stay at the size of one frame instead of copies
+of the whole volume.
+"""
+import queue
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from .layer import Layer
+from .profile import profile_stage
+
+
+class StreamLayer:
+    """
+    One output layer of a streaming import.
+
+    - prepare maps a source frame (XYZC) to the frame of this layer before resampling.
+    - offset is added to scalar values when written to VDB so they are non-negative.
+    """
+
+    def __init__(self, name: str, kind: str, prepare: Callable, offset: float = 0.0):
+        self.name = name
+        self.kind = kind
+        self.prepare = prepare
+        self.offset = offset
+
+
+def transform_frame_source(data: np.ndarray, shape: tuple, frame_source: str):
+    """
+    Reorder TXYZC data so the chosen axis becomes frames, returns views.
+
+    - "-1": first frame, "0": frames, "1"/"2"/"3": X/Y/Z axis, otherwise channels.
+    - shape is the XYZ layer shape, the axis turned into frames becomes 1.
+    """
+    if frame_source == "-1":
+        data = data[0:1, :, :, :, :]
+    elif frame_source == "0":
+        pass
+    elif frame_source == "1":
+        data = data.transpose(1, 0, 2, 3, 4)
+        shape = (1, shape[1], shape[2])
+    elif frame_source == "2":
+        data = data.transpose(2, 1, 0, 3, 4)
+        shape = (shape[0], 1, shape[2])
+    elif frame_source == "3":
+        data = data.transpose(3, 1, 2, 0, 4)
+        shape = (shape[0], shape[1], 1)
+    else:
+        data = data.transpose(4, 1, 2, 3, 0)
+
+    return data, tuple(shape)
+
+
+def get_value_range(data: np.ndarray):
+    return float(np.min(data)), float(np.max(data))
+
+
+def get_stream_layers(data: np.ndarray, kind: str, name: str, remap: bool = False,
+                      split_channel: bool = False,
+                      label_count: Optional[int] = None) -> List[StreamLayer]:
+    """
+    Describe the layers an import makes from TXYZC data, without touching the data yet.
+
+    Whole volume statistics (label count, value range) are read here in one
+    pass, everything else is done per frame by StreamLayer.prepare.
+    """
+    layers = []
+
+    if kind == "label":
+        if label_count is None:
+            label_count = int(np.max(data))
+        for i in range(label_count):
+            layers.append(StreamLayer(
+                f"{name}_{i+1}",
+                kind,
+                lambda frame, value=i + 1: frame == value,
+            ))
+
+    elif kind == "color":
+        if np.issubdtype(data.dtype, np.uint8):
+            scale, min_val = 1.0 / 256, 0.0
+        elif data.dtype.kind in ["u", "i"]:
+            min_val, max_val = get_value_range(data)
+            scale = 1.0 / (max_val - min_val) if max_val != min_val else 0.0
+        else:
+            scale, min_val = 1.0, 0.0
+
+        def prepare_color(frame):
+            color = frame.astype(np.float32)
+            if min_val:
+                color -= min_val
+            if scale != 1.0:
+                color *= scale
+
+            if color.shape[3] == 1:
+                color = np.repeat(color, repeats=3, axis=3)
+            elif color.shape[3] == 2:
+                zeros = np.zeros((*color.shape[:3], 1), dtype=np.float32)
+                color = np.concatenate((color, zeros), axis=-1)
+            elif color.shape[3] > 3:
+                color = color[:, :, :, :3]
+            return color
+
+        layers.append(StreamLayer(name, kind, prepare_color))
+
+    elif kind == "scalar":
+        min_val, max_val = get_value_range(data) if remap else (0.0, 0.0)
+
+        def prepare_scalar(frame):
+            if not remap:
+                return frame
+            if max_val == min_val:
+                return np.zeros(frame.shape, dtype=np.float32)
+            scalar = frame.astype(np.float32)
+            scalar -= min_val
+            scalar /= max_val - min_val
+            return scalar
+
+        if split_channel:
+            for i in range(data.shape[-1]):
+                offset = 0.0 if remap else max(0.0, -float(np.min(data[..., i])))
+                layers.append(StreamLayer(
+                    f"{name}_{i+1}",
+                    kind,
+                    lambda frame, i=i: prepare_scalar(frame[:, :, :, i : i + 1]),
+                    offset,
+                ))
+        else:
+            offset = 0.0 if remap else max(0.0, -float(np.min(data)))
+            layers.append(StreamLayer(name, kind, prepare_scalar, offset))
+
+    return layers
+
+
+def resample_frame(frame: np.ndarray, shape: tuple, smooth: int = 0) -> np.ndarray:
+    """Resample one XYZC frame to the XYZ shape, same rules as Layer.resize."""
+    layer = Layer(data=frame[np.newaxis], name="", kind="")
+    layer.resize(shape=shape, smooth=smooth)
+    return layer.data[0]
+
+
+def stream_layers(data: np.ndarray, layers: List[StreamLayer], shape: tuple, sink: Callable,
+                  smooth: int = 0, progress_callback=None,
+                  queue_depth: int = 0, writer_count: int = 1, profile=None):
+    """
+    Run layers over TXYZC data one frame at a time.
+
+    - Each frame is prepared and resampled for every layer, then passed to
+      sink(layer_index, frame_index, frame) before the next frame is read.
+    - data is only read, frame_source must already be applied.
+    - progress_callback(frame, total) is called before each frame.
+    - queue_depth > 0 runs a reader thread that prefetches up to queue_depth
+      frames and writer_count writer threads that call sink, so reading and
+      writing overlap with resampling. Frames of a layer always reach sink
+      in order and from the same thread.
+    - profile (ImportProfile) records the read, prepare and resample stages.
+    """
+    if queue_depth <= 0:
+        frame_count = data.shape[0]
+        for f in range(frame_count):
+            if progress_callback:
+                progress_callback(f, frame_count)
+
+            source_frame = data[f]
+            for i, layer in enumerate(layers):
+                sink(i, f, process_frame(layer, source_frame, shape, smooth, profile))
+        return
+
+    pipeline = FramePipeline(data, sink, queue_depth, min(writer_count, len(layers)) or 1,
+                             profile)
+    pipeline.run(layers, shape, smooth, progress_callback)
+
+
+def process_frame(layer: StreamLayer, source_frame: np.ndarray, shape: tuple,
+                  smooth: int = 0, profile=None) -> np.ndarray:
+    with profile_stage(profile, "prepare"):
+        frame = layer.prepare(source_frame)
+    with profile_stage(profile, "resample"):
+        return resample_frame(frame, shape, smooth)
+
+
+class FramePipeline:
+    """
+    Bounded reader -> compute -> writer pipeline used by stream_layers.
+
+    The reader copies frames out of data (this is where memory mapped or
+    lazily loaded sources hit the disk), compute runs in the calling thread
+    and writers drain per-thread queues. The first error of any stage stops
+    the others and is raised from run.
+    """
+
+    def __init__(self, data: np.ndarray, sink: Callable, queue_depth: int, writer_count: int,
+                 profile=None):
+        self.data = data
+        self.sink = sink
+        self.profile = profile
+        self.stop = threading.Event()
+        self.error = None
+        self.read_queue = queue.Queue(maxsize=queue_depth)
+        self.write_queues = [queue.Queue(maxsize=queue_depth) for _ in range(writer_count)]
+
+    def fail(self, error: BaseException):
+        if self.error is None:
+            self.error = error
+        self.stop.set()
+
+    def put(self, q: queue.Queue, item) -> bool:
+        # blocking put that gives up once the pipeline is stopped
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, q: queue.Queue):
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if self.stop.is_set():
+                    return None
+
+    def read(self):
+        try:
+            for f in range(self.data.shape[0]):
+                with profile_stage(self.profile, "read"):
+                    source_frame = np.ascontiguousarray(self.data[f])
+                if not self.put(self.read_queue, (f, source_frame)):
+                    return
+            self.put(self.read_queue, None)
+        except BaseException as e:
+            self.fail(e)
+
+    def write(self, q: queue.Queue):
+        try:
+            while True:
+                item = self.get(q)
+                if item is None:
+                    return
+                self.sink(*item)
+        except BaseException as e:
+            self.fail(e)
+
+    def run(self, layers: List[StreamLayer], shape: tuple, smooth: int = 0,
+            progress_callback=None):
+        frame_count = self.data.shape[0]
+        threads = [threading.Thread(target=self.read, daemon=True)]
+        threads += [
+            threading.Thread(target=self.write, args=(q,), daemon=True)
+            for q in self.write_queues
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            while not self.stop.is_set():
+                item = self.get(self.read_queue)
+                if item is None:
+                    break
+                f, source_frame = item
+                if progress_callback:
+                    progress_callback(f, frame_count)
+
+                for i, layer in enumerate(layers):
+                    frame = process_frame(layer, source_frame, shape, smooth, self.profile)
+                    # a layer always goes to the same writer, keeps its frames in order
+                    if not self.put(self.write_queues[i % len(self.write_queues)], (i, f, frame)):
+                        break
+        except BaseException as e:
+            self.fail(e)
+        finally:
+            for q in self.write_queues:
+                self.put(q, None)
+            if self.error is not None:
+                self.stop.set()
+            for thread in threads[1:]:
+                thread.join()
+            self.stop.set()
+            threads[0].join()
+
+        if self.error is not None:
+            raise self.error
@@ -0,0 +1,244 @@
+"""
+Import worker process, runs engine jobs for Blender.
+
+Started by Blender either as a background Blender ("--command
+bioxelnodes_import_worker <config>") or as a plain Python
+("python -m bioxel.worker <config>" with the add-on folder on the path).
+"""
+import json
+import struct
+import sys
+import time
+import traceback
+from pathlib import Path
+
+from .engine import build_layers, read_meta, read_series
+
+# seconds a persistent worker waits for a new job before quitting
+WORKER_IDLE_TIMEOUT = 600
+# seconds between progress file writes or cancel file checks
+PROGRESS_INTERVAL = 0.1
+
+
+def write_json(path: Path, data):
+    temp_path = path.with_suffix(path.suffix + ".tmp")
+    temp_path.write_text(json.dumps(data), encoding="utf-8")
+    temp_path.replace(path)
+
+
+class ProgressChannel:
+    """
+    Progress and cancel state shared between Blender and a worker.
+
+    A small shared memory block, so reporting progress and checking for
+    cancel are plain memory accesses instead of file writes and stats.
+    Layout: factor (float64), sequence (uint32), cancel flag (uint8),
+    text length (uint16) and utf-8 text. The writer makes the sequence
+    odd while writing so readers can skip torn reads, the cancel flag is
+    only written by Blender.
+    """
+
+    SIZE = 512
+    STATE = struct.Struct("<dI")  # factor, sequence
+    CANCEL_OFFSET = 12
+    LENGTH = struct.Struct("<H")
+    LENGTH_OFFSET = 14
+    TEXT_OFFSET = 16
+
+    def __init__(self, name=None):
+        from multiprocessing import shared_memory
+
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.SIZE)
+            self.shm.buf[: self.TEXT_OFFSET] = bytes(self.TEXT_OFFSET)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            try:
+                # the creator owns the block, do not let this process unlink it at exit
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self.shm._name, "shared_memory")
+            except Exception:
+                pass
+        self.sequence = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, factor: float, text: str):
+        buf = self.shm.buf
+        text_bytes = text.encode("utf-8")[: self.SIZE - self.TEXT_OFFSET]
+        self.sequence += 1
+        self.STATE.pack_into(buf, 0, factor, self.sequence * 2 - 1)
+        self.LENGTH.pack_into(buf, self.LENGTH_OFFSET, len(text_bytes))
+        buf[self.TEXT_OFFSET: self.TEXT_OFFSET + len(text_bytes)] = text_bytes
+        self.STATE.pack_into(buf, 0, factor, self.sequence * 2)
+
+    def read(self):
+        buf = self.shm.buf
+        for _ in range(3):
+            factor, sequence = self.STATE.unpack_from(buf, 0)
+            if sequence == 0 or sequence % 2:
+                continue
+            length, = self.LENGTH.unpack_from(buf, self.LENGTH_OFFSET)
+            text = bytes(buf[self.TEXT_OFFSET: self.TEXT_OFFSET + length])
+            if self.STATE.unpack_from(buf, 0)[1] == sequence:
+                return {"factor": factor, "text": text.decode("utf-8", "ignore")}
+        return None
+
+    def cancel(self):
+        self.shm.buf[self.CANCEL_OFFSET] = 1
+
+    def is_cancelled(self):
+        return self.shm.buf[self.CANCEL_OFFSET] == 1
+
+    def close(self, unlink=False):
+        try:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+        except Exception:
+            pass
+
+
+class ProgressReporter:
+    """
+    Report progress and check for cancel from a worker job.
+
+    Uses the shared ProgressChannel when Blender provides one, otherwise
+    falls back to progress.json and the cancel file, rate limited to one
+    write and one stat per PROGRESS_INTERVAL.
+    """
+
+    def __init__(self, progress_path: Path, cancel_path: Path, channel_name=None):
+        self.progress_path = progress_path
+        self.cancel_path = cancel_path
+        self.channel = None
+        if channel_name:
+            try:
+                self.channel = ProgressChannel(channel_name)
+            except Exception as e:
+                print(f"Progress channel unavailable, fall back to files: {e}")
+        self.last_report = 0.0
+        self.last_cancel_check = 0.0
+
+    def check_cancel(self):
+        if self.channel is not None:
+            is_cancelled = self.channel.is_cancelled()
+        else:
+            now = time.monotonic()
+            if now - self.last_cancel_check < PROGRESS_INTERVAL:
+                return
+            self.last_cancel_check = now
+            is_cancelled = self.cancel_path.exists()
+
+        if is_cancelled:
+            raise KeyboardInterrupt("Cancelled by user")
+
+    def report(self, factor: float, text: str, force=False):
+        self.check_cancel()
+        if self.channel is not None:
+            self.channel.write(factor, text)
+            return
+
+        now = time.monotonic()
+        if not force and now - self.last_report < PROGRESS_INTERVAL:
+            return
+        self.last_report = now
+        write_json(self.progress_path, {"factor": factor, "text": text})
+
+    def finish(self):
+        if self.channel is not None:
+            self.channel.write(1.0, "")
+        write_json(self.progress_path, {"factor": 1.0, "text": ""})
+
+
+def run_job(config):
+    progress_path = Path(config["progress_path"])
+    result_path = Path(config["result_path"])
+    cancel_path = Path(config["cancel_path"])
+    reporter = ProgressReporter(
+        progress_path, cancel_path, config.get("progress_channel")
+    )
+
+    try:
+        reporter.report(0.0, "Loading import modules...", force=True)
+        if config["command"] == "read_series":
+            result = read_series(config, reporter)
+        elif config["command"] == "read_meta":
+            result = read_meta(config, reporter)
+        elif config["command"] == "import_layers":
+            result = build_layers(config, reporter)
+        else:
+            raise ValueError(f"Unknown command: {config['command']}")
+
+        write_json(result_path, {"ok": True, **result})
+        reporter.finish()
+    except KeyboardInterrupt:
+        write_json(result_path, {"ok": False, "cancelled": True})
+    except Exception as e:
+        write_json(
+            result_path,
+            {
+                "ok": False,
+                "error": str(e),
+                "traceback": traceback.format_exc(),
+            },
+        )
+    finally:
+        if reporter.channel is not None:
+            reporter.channel.close()
+
+
+def serve(config):
+    """
+    Stay alive and run import jobs sent over a local connection.
+
+    Modules imported by the first job stay loaded for the next ones. The
+    worker quits on a "quit" message, when the connection is closed (the
+    Blender session is gone) or after being idle for too long.
+    """
+    from multiprocessing.connection import Listener
+
+    ready_path = Path(config["ready_path"])
+    authkey = bytes.fromhex(config["authkey"])
+
+    with Listener(("localhost", 0), authkey=authkey) as listener:
+        write_json(ready_path, {"address": list(listener.address)})
+        with listener.accept() as conn:
+            print("Bioxel worker is ready for jobs.")
+            while conn.poll(WORKER_IDLE_TIMEOUT):
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    break
+
+                if message.get("command") == "quit":
+                    break
+
+                job_config = message["config"]
+                print(f"Running job {job_config['command']}...")
+                run_job(job_config)
+                conn.send({"done": True})
+
+    print("Bioxel worker stopped.")
+    return 0
+
+
+def main(args):
+    if not args:
+        print("Usage: blender --command bioxelnodes_import_worker <config_path>")
+        return 2
+
+    config_path = Path(args[0])
+    config = json.loads(config_path.read_text(encoding="utf-8"))
+
+    if config["command"] == "serve":
+        return serve(config)
+
+    run_job(config)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
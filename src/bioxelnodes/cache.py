@@ -0,0 +1,375 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import bpy
+from bpy.app.handlers import persistent
+
+from .bioxel.engine import CACHE_INFO_FILENAME
+from .layer import get_layer_caches
+from .utils import get_cache_dir, get_preferences
+
+CACHE_INDEX_FILENAME = "index.json"
+# blend files not opened for this long no longer keep their caches alive
+REFERENCE_EXPIRE_DAYS = 30
+
+# last scan result, read by the preferences panel
+CACHE_USAGE = {"size": 0, "count": 0, "time": 0.0}
+
+# seconds between background checks of the layer folders of the open file
+CACHE_STATUS_INTERVAL = 30.0
+# seconds between polls while a check is running
+CACHE_STATUS_POLL = 0.2
+
+_index_lock = threading.Lock()
+_evict_thread = None
+
+
+def get_layers_cache_dir() -> Path:
+    layers_dir = get_cache_dir() / "layers"
+    layers_dir.mkdir(parents=True, exist_ok=True)
+    return layers_dir
+
+
+def get_cache_quota() -> int:
+    """Cache quota in bytes, 0 means unlimited."""
+    return int(get_preferences().cache_quota * 1024**3)
+
+
+def read_cache_index(layers_dir: Path) -> dict:
+    """
+    Read the cache index of a layers cache directory.
+
+    - "caches" maps cache id to {"atime", "size", "referenced"}, referenced is
+      set once a saved blend file has used the cache.
+    - "references" maps blend filepath to {"time", "ids"}, the caches that file used when last opened.
+    """
+    try:
+        index = json.loads((layers_dir / CACHE_INDEX_FILENAME).read_text(encoding="utf-8"))
+    except Exception:
+        index = {}
+
+    index.setdefault("caches", {})
+    index.setdefault("references", {})
+    return index
+
+
+def write_cache_index(layers_dir: Path, index: dict):
+    index_path = layers_dir / CACHE_INDEX_FILENAME
+    temp_path = index_path.with_suffix(f".{os.getpid()}.tmp")
+    temp_path.write_text(json.dumps(index), encoding="utf-8")
+    temp_path.replace(index_path)
+
+
+def update_cache_index(layers_dir: Path, update):
+    with _index_lock:
+        index = read_cache_index(layers_dir)
+        update(index)
+        write_cache_index(layers_dir, index)
+
+
+def touch_caches(layers_dir: Path, cache_ids):
+    """Mark caches as just used."""
+    now = time.time()
+
+    def update(index):
+        for cache_id in cache_ids:
+            index["caches"].setdefault(str(cache_id), {})["atime"] = now
+
+    update_cache_index(layers_dir, update)
+
+
+def track_references(layers_dir: Path, blend_filepath: str, cache_ids):
+    """Record which caches a blend file uses, so they are not evicted."""
+    def update(index):
+        index["references"][blend_filepath] = {
+            "time": time.time(),
+            "ids": [str(cache_id) for cache_id in cache_ids],
+        }
+        for cache_id in cache_ids:
+            index["caches"].setdefault(str(cache_id), {})["referenced"] = True
+
+    update_cache_index(layers_dir, update)
+
+
+def get_dir_size(dirpath: Path) -> int:
+    size = 0
+    for root, dirs, files in os.walk(dirpath):
+        for filename in files:
+            try:
+                size += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return size
+
+
+def get_referenced_ids(index: dict) -> set:
+    """Cache ids used by blend files opened recently that still exist."""
+    expire_time = time.time() - REFERENCE_EXPIRE_DAYS * 24 * 3600
+    referenced_ids = set()
+    for blend_filepath, reference in list(index["references"].items()):
+        if reference["time"] < expire_time or not Path(blend_filepath).is_file():
+            del index["references"][blend_filepath]
+            continue
+        referenced_ids.update(reference["ids"])
+    return referenced_ids
+
+
+def evict_caches(layers_dir: Path, quota: int, pinned_ids: set):
+    """
+    Remove least recently used caches until the layers cache fits in quota.
+
+    - Caches referenced by recently opened blend files or in pinned_ids are never removed.
+    - Only caches the index has seen used by a saved blend file (and touched)
+      can be removed, once no recent file references them any more. Caches
+      without such a record, e.g. of projects not opened since the index
+      exists, are kept: they may be the only copy of imported layers.
+    - Sizes are measured once and kept in the index.
+    - Safe to run in a background thread, it does not touch bpy.
+    """
+    with _index_lock:
+        index = read_cache_index(layers_dir)
+    referenced_ids = get_referenced_ids(index) | set(pinned_ids)
+
+    entries = []
+    for cache_path in layers_dir.iterdir():
+        if not cache_path.is_dir():
+            continue
+        cache_id = cache_path.name
+        # an import may still be writing into a fresh cache
+        is_writing = not (cache_path / CACHE_INFO_FILENAME).is_file() \
+            and time.time() - cache_path.stat().st_mtime < 3600
+        if is_writing:
+            referenced_ids.add(cache_id)
+        record = index["caches"].get(cache_id, {})
+        if not (record.get("atime") and record.get("referenced")):
+            referenced_ids.add(cache_id)
+        size = record.get("size")
+        if size is None:
+            size = get_dir_size(cache_path)
+        atime = record.get("atime") or cache_path.stat().st_mtime
+        entries.append((atime, cache_id, cache_path, size))
+
+    total = sum(entry[3] for entry in entries)
+    evicted_ids = []
+    if quota > 0 and total > quota:
+        for atime, cache_id, cache_path, size in sorted(entries):
+            if total <= quota:
+                break
+            if cache_id in referenced_ids:
+                continue
+            shutil.rmtree(cache_path, ignore_errors=True)
+            total -= size
+            evicted_ids.append(cache_id)
+
+    CACHE_USAGE["size"] = total
+    CACHE_USAGE["count"] = len(entries) - len(evicted_ids)
+    CACHE_USAGE["time"] = time.time()
+
+    sizes = {entry[1]: entry[3] for entry in entries}
+
+    def update(index):
+        get_referenced_ids(index)
+        for cache_id, size in sizes.items():
+            index["caches"].setdefault(cache_id, {})["size"] = size
+        for cache_id in evicted_ids:
+            index["caches"].pop(cache_id, None)
+        # forget caches removed by other means
+        for cache_id in list(index["caches"].keys()):
+            if cache_id not in sizes:
+                del index["caches"][cache_id]
+
+    update_cache_index(layers_dir, update)
+
+    if evicted_ids:
+        print(f"Evicted {len(evicted_ids)} unused layer caches")
+    return evicted_ids
+
+
+def start_cache_eviction():
+    """Run evict_caches in a background thread for the current preferences and file."""
+    global _evict_thread
+    if _evict_thread and _evict_thread.is_alive():
+        return
+
+    layers_dir = get_layers_cache_dir()
+    quota = get_cache_quota()
+    pinned_ids = {str(c.get("id", "")) for c in get_layer_caches()}
+
+    _evict_thread = threading.Thread(
+        target=evict_caches, args=(layers_dir, quota, pinned_ids), daemon=True
+    )
+    _evict_thread.start()
+
+
+def record_file_caches():
+    layers_dir = get_layers_cache_dir()
+    cache_ids = [str(c.get("id", "")) for c in get_layer_caches()]
+    touch_caches(layers_dir, cache_ids)
+    if bpy.data.filepath:
+        track_references(layers_dir, bpy.data.filepath, cache_ids)
+
+
+def get_cache_status_key(path: str) -> str:
+    """Normalized absolute folder of a layer path, resolved on the main thread."""
+    return os.path.normcase(os.path.normpath(bpy.path.abspath(path)))
+
+
+class CacheStatusMonitor:
+    """
+    Existence and size of layer cache folders, checked off the UI thread.
+
+    - Draw code only reads results through get(), a folder not checked yet
+      is queued and get() returns None until its check finishes.
+    - Folders are checked on file load, after imports and relocations, and
+      every CACHE_STATUS_INTERVAL seconds through a timer.
+    - Stat calls on slow network storage only block the worker thread.
+    """
+
+    def __init__(self):
+        # folder key -> {"exists", "size", "histogram", "mtime", "time"}
+        self.status = {}
+        self.pending = set()
+        self.running = set()
+        self.thread = None
+        self.updated = False
+        self.last_check = 0.0
+
+    @property
+    def is_busy(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def get(self, path: str):
+        """Last known status of a layer folder, None while it is unknown."""
+        key = get_cache_status_key(path)
+        status = self.status.get(key)
+        if status is None and key not in self.pending and key not in self.running:
+            self.request([key])
+        return status
+
+    def request(self, keys):
+        self.pending.update(keys)
+        # wake the timer up, it may be waiting a whole interval
+        if bpy.app.timers.is_registered(_update_cache_status):
+            bpy.app.timers.unregister(_update_cache_status)
+        bpy.app.timers.register(_update_cache_status, first_interval=0.0, persistent=True)
+
+    def check(self, caches=None):
+        """Queue the folders of caches, all layers of the file by default."""
+        if caches is None:
+            caches = get_layer_caches()
+            self.last_check = time.time()
+        self.request([get_cache_status_key(c["path"]) for c in caches if c.get("path")])
+
+    def start(self):
+        if self.is_busy or not self.pending:
+            return
+        self.running = self.pending
+        self.pending = set()
+        self.thread = threading.Thread(
+            target=self.run, args=(list(self.running),), daemon=True
+        )
+        self.thread.start()
+
+    def run(self, keys):
+        """Stat the given folders, does not touch bpy."""
+        for key in keys:
+            path = Path(key)
+            try:
+                mtime = path.stat().st_mtime
+                exists = path.is_dir()
+                has_histogram = exists and (path / "histogram.png").is_file()
+            except OSError:
+                mtime = None
+                exists = has_histogram = False
+
+            # walking the folder is the slow part, skip it while it is unchanged
+            last = self.status.get(key)
+            if last and last["exists"] and last["mtime"] == mtime:
+                size = last["size"]
+            else:
+                size = get_dir_size(path) if exists else 0
+
+            self.status[key] = {
+                "exists": exists,
+                "size": size,
+                "histogram": has_histogram,
+                "mtime": mtime,
+                "time": time.time(),
+            }
+        self.updated = True
+
+    def clear(self):
+        self.status.clear()
+        self.pending.clear()
+
+
+CACHE_STATUS = CacheStatusMonitor()
+
+
+def get_cache_status(cache):
+    """Cached status of a layer entry's folder, None until it has been checked."""
+    return CACHE_STATUS.get(cache["path"])
+
+
+def _update_cache_status():
+    monitor = CACHE_STATUS
+    if monitor.is_busy:
+        return CACHE_STATUS_POLL
+
+    monitor.running = set()
+    if monitor.updated:
+        monitor.updated = False
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == "NODE_EDITOR":
+                    area.tag_redraw()
+
+    if not monitor.pending and time.time() - monitor.last_check >= CACHE_STATUS_INTERVAL:
+        monitor.check()
+    if monitor.pending:
+        monitor.start()
+        return CACHE_STATUS_POLL
+    return CACHE_STATUS_INTERVAL
+
+
+@persistent
+def _on_load_post(*args):
+    CACHE_STATUS.clear()
+    try:
+        CACHE_STATUS.check()
+    except Exception as e:
+        print(f"Failed to check layer caches: {e}")
+
+    try:
+        record_file_caches()
+        start_cache_eviction()
+    except Exception as e:
+        print(f"Failed to update layer cache index: {e}")
+
+
+@persistent
+def _on_save_post(*args):
+    try:
+        record_file_caches()
+    except Exception as e:
+        print(f"Failed to update layer cache index: {e}")
+
+
+def register():
+    bpy.app.handlers.load_post.append(_on_load_post)
+    bpy.app.handlers.save_post.append(_on_save_post)
+    bpy.app.timers.register(_update_cache_status, first_interval=1.0, persistent=True)
+
+
+def unregister():
+    if _on_load_post in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(_on_load_post)
+    if _on_save_post in bpy.app.handlers.save_post:
+        bpy.app.handlers.save_post.remove(_on_save_post)
+    if bpy.app.timers.is_registered(_update_cache_status):
+        bpy.app.timers.unregister(_update_cache_status)
+    CACHE_STATUS.clear()
@@ -1,5 +1,5 @@
-from pathlib import Path
 import bpy
+from bpy.app.handlers import persistent
 
 # LookupError replaced with built-in LookupError
 from .constants import LATEST_NODE_LIB_PATH, NODE_LIB_FILENAME
@@ -147,3 +147,184 @@ def get_main_node_group(context):
     if getattr(node_tree, "bl_idname", "") == "GeometryNodeTree" or node_tree.__class__.__name__ == "GeometryNodeTree":
         return node_tree
     return None
+
+
+def get_layer_node_id(node) -> str:
+    return str(getattr(node.inputs.get("ID"), "default_value", ""))
+
+
+class LayerNodeIndex:
+    """
+    Cache id -> O Layer nodes over all node groups.
+
+    - Built on first use, rebuilt after file load and undo/redo.
+    - A node group is re-scanned on the next lookup when it was edited in
+      the depsgraph, when its node count changed (nodes added, pasted or
+      appended, also in groups no object evaluates) or when it is new.
+    - Entries are (node group name, node name), an entry that no longer
+      resolves re-scans its node group only.
+    """
+
+    def __init__(self):
+        # cache id -> {(node group name, node name)}
+        self.nodes = None
+        # node group name -> cache ids it holds nodes of
+        self.groups = {}
+        # node group name -> node count when scanned
+        self.counts = {}
+        self.dirty = set()
+
+    def invalidate(self):
+        self.nodes = None
+        self.groups = {}
+        self.counts = {}
+        self.dirty.clear()
+
+    def mark_dirty(self, group_name: str):
+        if self.nodes is not None:
+            self.dirty.add(group_name)
+
+    def add(self, node_group, node):
+        if self.nodes is None:
+            return
+        cache_id = get_layer_node_id(node)
+        self.nodes.setdefault(cache_id, set()).add((node_group.name, node.name))
+        self.groups.setdefault(node_group.name, set()).add(cache_id)
+        self.counts[node_group.name] = len(node_group.nodes)
+
+    def drop_group(self, group_name: str):
+        self.counts.pop(group_name, None)
+        for cache_id in self.groups.pop(group_name, ()):
+            keys = self.nodes.get(cache_id, set())
+            keys.difference_update({k for k in keys if k[0] == group_name})
+            if not keys:
+                self.nodes.pop(cache_id, None)
+
+    def scan_group(self, node_group):
+        self.drop_group(node_group.name)
+        self.counts[node_group.name] = len(node_group.nodes)
+        for node in get_layer_nodes(node_group):
+            self.add(node_group, node)
+
+    def rebuild(self):
+        self.nodes = {}
+        self.groups = {}
+        self.counts = {}
+        self.dirty.clear()
+        for node_group in bpy.data.node_groups:
+            self.scan_group(node_group)
+
+    def refresh(self):
+        if self.nodes is None:
+            self.rebuild()
+            return
+
+        # 只比较节点数量，不遍历节点
+        names = set()
+        for node_group in bpy.data.node_groups:
+            names.add(node_group.name)
+            if self.counts.get(node_group.name) != len(node_group.nodes):
+                self.dirty.add(node_group.name)
+        for group_name in set(self.counts) - names:
+            self.dirty.add(group_name)
+
+        for group_name in self.dirty:
+            node_group = bpy.data.node_groups.get(group_name)
+            if node_group is None:
+                self.drop_group(group_name)
+            else:
+                self.scan_group(node_group)
+        self.dirty.clear()
+
+    def resolve(self, cache_id: str):
+        """Resolved (node group, node) pairs and the node groups of stale entries."""
+        nodes, stale = [], set()
+        for group_name, node_name in self.nodes.get(cache_id, ()):
+            node_group = bpy.data.node_groups.get(group_name)
+            node = node_group.nodes.get(node_name) if node_group else None
+            if node is None or get_layer_node_id(node) != cache_id:
+                stale.add(group_name)
+            else:
+                nodes.append((node_group, node))
+        return nodes, stale
+
+    def get(self, cache_id) -> list:
+        """(node group, node) pairs of the O Layer nodes showing a layer cache."""
+        self.refresh()
+        cache_id = str(cache_id)
+        nodes, stale = self.resolve(cache_id)
+        if stale:
+            # renamed or edited outside the depsgraph, re-scan those groups only
+            self.dirty.update(stale)
+            self.refresh()
+            nodes, _ = self.resolve(cache_id)
+        return nodes
+
+
+LAYER_NODES = LayerNodeIndex()
+
+
+def get_layer_nodes_by_id(cache_id):
+    """O Layer nodes of a layer cache, through LAYER_NODES."""
+    return [node for _, node in LAYER_NODES.get(cache_id)]
+
+
+def get_layer_objects_by_id(cache_id):
+    """
+    Objects whose modifiers evaluate the O Layer nodes of a layer cache.
+
+    Users are resolved by bpy.data.user_map, nested node groups included.
+    """
+    node_groups = {node_group for node_group, _ in LAYER_NODES.get(cache_id)}
+    if not node_groups:
+        return []
+
+    user_map = bpy.data.user_map(subset=bpy.data.node_groups)
+    objects = set()
+    seen = set()
+    pending = list(node_groups)
+    while pending:
+        node_group = pending.pop()
+        if node_group in seen:
+            continue
+        seen.add(node_group)
+        for user in user_map.get(node_group, ()):
+            if isinstance(user, bpy.types.Object):
+                objects.add(user)
+            elif isinstance(user, bpy.types.NodeTree):
+                pending.append(user)
+    return list(objects)
+
+
+@persistent
+def _invalidate_layer_nodes(*args):
+    LAYER_NODES.invalidate()
+
+
+@persistent
+def _on_depsgraph_update_post(scene, depsgraph):
+    if LAYER_NODES.nodes is None:
+        return
+    for update in depsgraph.updates:
+        node_tree = getattr(update.id, "original", update.id)
+        if isinstance(node_tree, bpy.types.NodeTree):
+            LAYER_NODES.mark_dirty(node_tree.name)
+
+
+LAYER_NODES_HANDLERS = ("load_post", "undo_post", "redo_post")
+
+
+def register():
+    for name in LAYER_NODES_HANDLERS:
+        getattr(bpy.app.handlers, name).append(_invalidate_layer_nodes)
+    bpy.app.handlers.depsgraph_update_post.append(_on_depsgraph_update_post)
+
+
+def unregister():
+    for name in LAYER_NODES_HANDLERS:
+        handlers = getattr(bpy.app.handlers, name)
+        if _invalidate_layer_nodes in handlers:
+            handlers.remove(_invalidate_layer_nodes)
+    if _on_depsgraph_update_post in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(_on_depsgraph_update_post)
+    LAYER_NODES.invalidate()
@@ -1,36 +1,42 @@
 import json
 import math
+import os
+import secrets
 import shutil
 import subprocess
+import sys
 import tempfile
+from multiprocessing.connection import Client
 from pathlib import Path
 
 import bpy
 import numpy as np
-import SimpleITK as sitk
 
 # KeyboardInterrupt replaced with built-in KeyboardInterrupt
 from ..props import BIOXEL_Series
 from ..utils import get_layer_obj, wrapped_label
 
-from ..bioxel.parse import DICOM_EXTS, SUPPORT_EXTS, get_ext, parse_volumetric_data
+from ..bioxel.parse import DICOM_EXTS, SUPPORT_EXTS, get_ext
 
-from ..utils import get_cache_dir, progress_update, progress_bar
+from ..utils import get_cache_dir, get_preferences, progress_update, progress_bar
 from ..layer import get_layer_caches, set_layer_caches
-
-
-def get_layer_shape(bioxel_size: float, orig_shape: tuple, orig_spacing: tuple):
-    shape = (
-        int(orig_shape[0] / bioxel_size * orig_spacing[0]),
-        int(orig_shape[1] / bioxel_size * orig_spacing[1]),
-        int(orig_shape[2] / bioxel_size * orig_spacing[2]),
-    )
-
-    return (
-        shape[0] if shape[0] > 0 else 1,
-        shape[1] if shape[1] > 0 else 1,
-        shape[2] if shape[2] > 0 else 1,
-    )
+from ..cache import (
+    CACHE_STATUS,
+    get_layers_cache_dir,
+    record_file_caches,
+    start_cache_eviction,
+)
+from ..bioxel.engine import (
+    MAX_BIOXEL_COUNT,
+    MEMORY_HEADROOM,
+    estimate_import_memory,
+    fits_in_memory,
+    get_available_memory,
+    get_fit_bioxel_size,
+    get_layer_shape,
+    get_memory_fit_bioxel_size,
+)
+from ..bioxel.worker import ProgressChannel
 
 
 def get_layer_size(shape: tuple, bioxel_size: float, scale: float = 1.0):
@@ -43,6 +49,52 @@ def get_layer_size(shape: tuple, bioxel_size: float, scale: float = 1.0):
     return size
 
 
+def get_import_settings(orig_shape: tuple, orig_spacing: tuple):
+    """
+    Guess import settings from the source shape and spacing.
+
+    Returns the spacing normalized to a workable magnitude, the default
+    bioxel size and the scene scale.
+    """
+    min_log10 = math.floor(math.log10(min(*orig_spacing)))
+    max_log10 = math.floor(math.log10(max(*orig_spacing)))
+
+    if orig_spacing[2] == 1 and min_log10 < -1:
+        orig_spacing = (
+            orig_spacing[0] * math.pow(10, -min_log10 - 2),
+            orig_spacing[1] * math.pow(10, -min_log10 - 2),
+            1,
+        )
+    elif min_log10 > 0:
+        orig_spacing = (
+            orig_spacing[0] * math.pow(10, -min_log10 - 1),
+            orig_spacing[1] * math.pow(10, -min_log10 - 1),
+            orig_spacing[2] * math.pow(10, -min_log10 - 1),
+        )
+    elif max_log10 < 0:
+        orig_spacing = (
+            orig_spacing[0] * math.pow(10, -max_log10 - 1),
+            orig_spacing[1] * math.pow(10, -max_log10 - 1),
+            orig_spacing[2] * math.pow(10, -max_log10 - 1),
+        )
+
+    bioxel_size = max(min(*orig_spacing), 1.0)
+
+    layer_shape = get_layer_shape(bioxel_size, orig_shape, orig_spacing)
+    layer_size = get_layer_size(layer_shape, bioxel_size, 0.01)
+    min_log10 = math.floor(math.log10(min(*layer_size)))
+    max_log10 = math.floor(math.log10(max(*layer_size)))
+
+    if min_log10 > 0:
+        scene_scale = math.pow(10, -min_log10 - 2)
+    elif max_log10 < 0:
+        scene_scale = math.pow(10, -max_log10 - 2)
+    else:
+        scene_scale = 0.01
+
+    return tuple(orig_spacing), bioxel_size, scene_scale
+
+
 def write_worker_json(path: Path, data):
     path.write_text(json.dumps(data), encoding="utf-8")
 
@@ -69,6 +121,159 @@ def get_addon_module_name():
     return package_name
 
 
+def get_worker_cmd(config_path: Path):
+    if get_preferences().worker_runtime == "PYTHON":
+        # the engine does not need bpy, skip Blender startup entirely
+        return [sys.executable, "-m", "bioxel.worker", str(config_path)]
+
+    return [
+        bpy.app.binary_path,
+        "--background",
+        "--addons",
+        get_addon_module_name(),
+        "--command",
+        "bioxelnodes_import_worker",
+        str(config_path),
+    ]
+
+
+def get_worker_env():
+    if get_preferences().worker_runtime != "PYTHON":
+        return None
+
+    # the add-on folder makes "bioxel" importable, Blender's paths bring its dependencies
+    addon_dir = str(Path(__file__).parent.parent)
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([addon_dir] + [p for p in sys.path if p])
+    return env
+
+
+def open_worker_process(config_path: Path, log_path: Path):
+    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    log_file = log_path.open("w", encoding="utf-8")
+    try:
+        return subprocess.Popen(
+            get_worker_cmd(config_path),
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            env=get_worker_env(),
+            creationflags=creationflags,
+        )
+    finally:
+        log_file.close()
+
+
+class PersistentWorker:
+    """
+    A background Blender that stays alive between imports.
+
+    Started on first use, it serves one job at a time over a local
+    multiprocessing connection, so later imports skip Blender startup,
+    add-on registration and heavy module imports.
+    """
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+        self.busy = False
+        self.worker_dir = None
+        self.ready_path = None
+        self.log_path = None
+        self.authkey = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self):
+        self.stop()
+        self.worker_dir = Path(
+            tempfile.mkdtemp(prefix="bioxel_worker_", dir=str(get_cache_dir()))
+        )
+        config_path = self.worker_dir / "config.json"
+        self.ready_path = self.worker_dir / "ready.json"
+        self.log_path = self.worker_dir / "worker.log"
+        self.authkey = secrets.token_bytes(16)
+
+        write_worker_json(
+            config_path,
+            {
+                "command": "serve",
+                "ready_path": str(self.ready_path),
+                "authkey": self.authkey.hex(),
+            },
+        )
+        print("Starting persistent Bioxel worker...")
+        self.process = open_worker_process(config_path, self.log_path)
+
+    def connect(self):
+        """Try to connect without blocking, True once connected."""
+        if self.conn is not None:
+            return True
+        if not self.is_alive():
+            return False
+
+        ready = read_worker_json(self.ready_path)
+        if not ready:
+            return False
+
+        try:
+            self.conn = Client(tuple(ready["address"]), authkey=self.authkey)
+        except Exception as e:
+            print(f"Failed to connect Bioxel worker: {e}")
+            self.stop()
+            return False
+        return True
+
+    def submit(self, config):
+        self.conn.send({"config": config})
+        self.busy = True
+
+    def poll_done(self):
+        """True when the submitted job is finished or the worker is gone."""
+        if not self.busy:
+            return True
+        if not self.is_alive():
+            self.busy = False
+            self.conn = None
+            return True
+        try:
+            if self.conn.poll():
+                self.conn.recv()
+                self.busy = False
+        except (EOFError, OSError):
+            self.stop()
+        return not self.busy
+
+    def stop(self):
+        if self.conn is not None:
+            try:
+                self.conn.send({"command": "quit"})
+                self.conn.close()
+            except Exception:
+                pass
+        if self.is_alive():
+            try:
+                self.process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                self.process.terminate()
+        self.process = None
+        self.conn = None
+        self.busy = False
+
+
+WORKER = PersistentWorker()
+
+# profile of the last finished import, shown in the Layer Library panel
+LAST_IMPORT_PROFILE = {}
+
+
+def set_last_import_profile(profile: dict, name: str):
+    LAST_IMPORT_PROFILE.clear()
+    if profile:
+        LAST_IMPORT_PROFILE.update(profile)
+        LAST_IMPORT_PROFILE["name"] = name
+
+
 def start_worker_process(owner, command: str, payload: dict):
     job_dir = Path(tempfile.mkdtemp(prefix="bioxel_import_", dir=str(get_cache_dir())))
     config_path = job_dir / "config.json"
@@ -77,6 +282,12 @@ def start_worker_process(owner, command: str, payload: dict):
     cancel_path = job_dir / "cancel"
     log_path = job_dir / "worker.log"
 
+    try:
+        channel = ProgressChannel()
+    except Exception as e:
+        print(f"Progress channel unavailable, fall back to files: {e}")
+        channel = None
+
     addon_name = get_addon_module_name()
     config = {
         **payload,
@@ -85,36 +296,32 @@ def start_worker_process(owner, command: str, payload: dict):
         "progress_path": str(progress_path),
         "result_path": str(result_path),
         "cancel_path": str(cancel_path),
+        "progress_channel": channel.name if channel else None,
     }
+    if command == "import_layers" and get_preferences().export_import_trace:
+        config["trace_path"] = str(job_dir / "trace.json")
     write_worker_json(config_path, config)
     write_worker_json(
         progress_path,
         {"factor": 0.0, "text": "Starting..."},
     )
 
-    print(f"Starting Bioxel worker with addon module: {addon_name}")
-    cmd = [
-        bpy.app.binary_path,
-        "--background",
-        "--addons",
-        addon_name,
-        "--command",
-        "bioxelnodes_import_worker",
-        str(config_path),
-    ]
-
-    creationflags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
-    log_file = log_path.open("w", encoding="utf-8")
-    try:
-        owner.process = subprocess.Popen(
-            cmd,
-            stdout=log_file,
-            stderr=subprocess.STDOUT,
-            creationflags=creationflags,
-        )
-    finally:
-        log_file.close()
-
+    owner.process = None
+    owner.worker = None
+    owner.pending_config = None
+    if get_preferences().use_persistent_worker and not WORKER.busy:
+        if not WORKER.is_alive():
+            WORKER.start()
+        # submitted by poll_worker_process once the worker is ready
+        owner.worker = WORKER
+        owner.pending_config = config
+        WORKER.busy = True
+        log_path = WORKER.log_path
+    else:
+        print(f"Starting Bioxel worker with addon module: {addon_name}")
+        owner.process = open_worker_process(config_path, log_path)
+
+    owner.channel = channel
     owner.job_dir = job_dir
     owner.progress_path = progress_path
     owner.result_path = result_path
@@ -122,17 +329,56 @@ def start_worker_process(owner, command: str, payload: dict):
     owner.log_path = log_path
 
 
-def cancel_worker_process(owner, context):
+def poll_worker_process(owner):
+    """True when the job started by start_worker_process is finished."""
+    if owner.process is not None:
+        return owner.process.poll() is not None
+
+    worker = owner.worker
+    if owner.pending_config is not None:
+        if not worker.is_alive():
+            worker.busy = False
+            return True
+        if worker.connect():
+            worker.submit(owner.pending_config)
+            owner.pending_config = None
+        return False
+
+    return worker.poll_done()
+
+
+def signal_worker_cancel(owner):
     owner.is_cancelled = True
+    if owner.channel is not None:
+        owner.channel.cancel()
     try:
         owner.cancel_path.write_text("cancel", encoding="utf-8")
     except Exception:
         pass
+
+
+def cancel_worker_process(owner, context):
+    signal_worker_cancel(owner)
     progress_update(context, 0.0, "Canceling...")
 
 
+def close_worker_channel(owner):
+    if owner.channel is not None:
+        owner.channel.close(unlink=True)
+        owner.channel = None
+
+
+def read_worker_progress(owner):
+    progress = None
+    if owner.channel is not None:
+        progress = owner.channel.read()
+    if progress is None:
+        progress = read_worker_json(owner.progress_path)
+    return progress
+
+
 def update_worker_progress(owner, context):
-    progress = read_worker_json(owner.progress_path)
+    progress = read_worker_progress(owner)
     if progress:
         progress_update(
             context,
@@ -140,6 +386,27 @@ def update_worker_progress(owner, context):
             progress.get("text", ""),
         )
 
+
+def merge_layer_caches(cache_infos):
+    """Add imported layer caches to bioxel_layers, True if these are the first layers."""
+    existing_data = get_layer_caches()
+    is_first_import = len(existing_data) == 0
+    # an identical import resolves to the same caches, add each only once
+    existing_ids = {str(c.get("id", "")) for c in existing_data}
+    existing_data.extend(
+        c for c in cache_infos if str(c["id"]) not in existing_ids
+    )
+    set_layer_caches(existing_data)
+    record_file_caches()
+    start_cache_eviction()
+    CACHE_STATUS.check(cache_infos)
+    return is_first_import
+
+
+def unregister():
+    WORKER.stop()
+
+
 """
 ImportData    -> ParseVolumetricData -> ImportDataDialog
     start import                 parse data              execute import
@@ -201,6 +468,7 @@ class ImportDataBase:
         context.window_manager.fileselect_add(self)
         return {"RUNNING_MODAL"}
 
+
 class ImportData(bpy.types.Operator, ImportDataBase):
     bl_idname = "bioxel.import_data"
     bl_label = "Import Data"
@@ -263,7 +531,11 @@ class ParseVolumetricData(bpy.types.Operator):
     meta = None
     label_count = 0
     dtype = None
+    command = None
     process = None
+    worker = None
+    pending_config = None
+    channel = None
     job_dir = None
     progress_path = None
     result_path = None
@@ -301,33 +573,95 @@ class ParseVolumetricData(bpy.types.Operator):
 
     series_ids: bpy.props.CollectionProperty(type=BIOXEL_Series)  # type: ignore
 
+    series_json: bpy.props.StringProperty(
+        options={"HIDDEN", "SKIP_SAVE"}
+    )  # type: ignore
+
     def execute(self, context):
         print("Collecting Meta Data...")
+        series_id = self.series_id if self.series_id != "empty" else ""
+        return self.start_job(
+            context,
+            "read_meta",
+            {"filepath": self.filepath, "series_id": series_id},
+        )
+
+    def start_job(self, context, command: str, payload: dict):
+        """Run a worker command in background, the result is handled in modal."""
+        self.command = command
+        self.is_cancelled = False
         progress_update(context, 0.0, "Collecting Meta Data...")
+        start_worker_process(self, command, payload)
 
-        def progress_callback(factor, text):
-            progress_update(context, factor, text)
+        self._timer = context.window_manager.event_timer_add(
+            time_step=0.1, window=context.window
+        )
+        bpy.types.STATUSBAR_HT_header.append(progress_bar)
 
-        try:
-            series_id = self.series_id if self.series_id != "empty" else ""
-            data, meta = parse_volumetric_data(
-                data_file=self.filepath,
-                series_id=series_id,
-                progress_callback=progress_callback,
-            )
-        except Exception as e:
-            raise e
+        context.window_manager.modal_handler_add(self)
+        return {"RUNNING_MODAL"}
+
+    def modal(self, context, event):
+        if event.type == "ESC":
+            cancel_worker_process(self, context)
+            return {"PASS_THROUGH"}
+
+        if event.type != "TIMER":
+            return {"PASS_THROUGH"}
+
+        update_worker_progress(self, context)
+
+        if not poll_worker_process(self):
+            return {"PASS_THROUGH"}
 
-        self.meta = meta
-        self.label_count = int(np.max(data))
-        self.dtype = data.dtype
+        context.window_manager.event_timer_remove(self._timer)
+        remove_progress_bar_safe()
+        close_worker_channel(self)
         progress_update(context, 1.0)
 
-        for key, value in self.meta.items():
+        result = read_worker_json(self.result_path)
+        if self.is_cancelled or (result and result.get("cancelled")):
+            self.report({"WARNING"}, "Canncelled by user.")
+            return {"CANCELLED"}
+
+        if not result:
+            self.report({"ERROR"}, f"Import worker failed. See log: {self.log_path}")
+            return {"CANCELLED"}
+
+        if not result.get("ok"):
+            print(result.get("traceback", ""))
+            self.report({"ERROR"}, result.get("error", "Import worker failed."))
+            return {"CANCELLED"}
+
+        if self.command == "read_series":
+            return self.on_series_read(result)
+        return self.on_meta_read(result)
+
+    def on_series_read(self, result):
+        if not result["series"]:
+            self.report({"ERROR"}, "Get no vaild series.")
+            return {"CANCELLED"}
+
+        # invoke again with the series known, to show the dialogs
+        bpy.ops.bioxel.parse_volumetric_data(
+            "INVOKE_DEFAULT",
+            filepath=self.filepath,
+            skip_read_as=self.skip_read_as,
+            read_as=self.read_as,
+            series_json=json.dumps(result["series"]),
+        )
+        return {"FINISHED"}
+
+    def on_meta_read(self, result):
+        meta = result["meta"]
+        self.label_count = result["label_count"]
+        self.dtype = result["dtype"]
+
+        for key, value in meta.items():
             print(f"{key}: {value}")
 
         if self.read_as == "LABEL":
-            if self.label_count > 100 or self.dtype.kind not in ["i", "u"]:
+            if self.label_count > 100 or result["dtype_kind"] not in ["i", "u"]:
                 self.report({"ERROR"}, "Invaild label data.")
                 return {"CANCELLED"}
 
@@ -335,58 +669,25 @@ class ParseVolumetricData(bpy.types.Operator):
                 self.report({"ERROR"}, "Get no label.")
                 return {"CANCELLED"}
 
-        orig_shape = self.meta["xyz_shape"]
-        orig_spacing = self.meta["spacing"]
-
-        min_log10 = math.floor(math.log10(min(*orig_spacing)))
-        max_log10 = math.floor(math.log10(max(*orig_spacing)))
-
-        if orig_spacing[2] == 1 and min_log10 < -1:
-            orig_spacing = (
-                orig_spacing[0] * math.pow(10, -min_log10 - 2),
-                orig_spacing[1] * math.pow(10, -min_log10 - 2),
-                1,
-            )
-        elif min_log10 > 0:
-            orig_spacing = (
-                orig_spacing[0] * math.pow(10, -min_log10 - 1),
-                orig_spacing[1] * math.pow(10, -min_log10 - 1),
-                orig_spacing[2] * math.pow(10, -min_log10 - 1),
-            )
-        elif max_log10 < 0:
-            orig_spacing = (
-                orig_spacing[0] * math.pow(10, -max_log10 - 1),
-                orig_spacing[1] * math.pow(10, -max_log10 - 1),
-                orig_spacing[2] * math.pow(10, -max_log10 - 1),
-            )
-
-        bioxel_size = max(min(*orig_spacing), 1.0)
-
-        layer_shape = get_layer_shape(bioxel_size, orig_shape, orig_spacing)
-        layer_size = get_layer_size(layer_shape, bioxel_size, 0.01)
-        min_log10 = math.floor(math.log10(min(*layer_size)))
-        max_log10 = math.floor(math.log10(max(*layer_size)))
-
-        if min_log10 > 0:
-            scene_scale = math.pow(10, -min_log10 - 2)
-        elif max_log10 < 0:
-            scene_scale = math.pow(10, -max_log10 - 2)
-        else:
-            scene_scale = 0.01
+        orig_shape = meta["xyz_shape"]
+        orig_spacing, bioxel_size, scene_scale = get_import_settings(
+            orig_shape, meta["spacing"]
+        )
 
         series_id = self.series_id if self.series_id != "empty" else ""
         bpy.ops.bioxel.import_volumetric_data_dialog(
             "INVOKE_DEFAULT",
             filepath=self.filepath,
-            layer_name=self.meta["description"],
+            layer_name=meta["description"],
             orig_shape=orig_shape,
             orig_spacing=orig_spacing,
             bioxel_size=bioxel_size,
             series_id=series_id,
-            frame_count=self.meta["frame_count"],
-            channel_count=self.meta["channel_count"],
+            frame_count=meta["frame_count"],
+            channel_count=meta["channel_count"],
             read_as=self.read_as,
             label_count=self.label_count,
+            dtype=self.dtype,
             scene_scale=scene_scale,
         )
 
@@ -414,61 +715,15 @@ class ParseVolumetricData(bpy.types.Operator):
 
         # Series Selection
         if ext in DICOM_EXTS:
-            data_dirpath = data_path.parent
-            reader = sitk.ImageSeriesReader()
-            reader.MetaDataDictionaryArrayUpdateOn()
-            reader.LoadPrivateTagsOn()
-
-            series_ids = reader.GetGDCMSeriesIDs(str(data_dirpath))
-            series_items = {}
-
-            for series_id in series_ids:
-                series_files = reader.GetGDCMSeriesFileNames(
-                    str(data_dirpath), series_id
-                )
-                single = sitk.ImageFileReader()
-                single.SetFileName(series_files[0])
-                single.LoadPrivateTagsOn()
-                single.ReadImageInformation()
-
-                def get_meta(key):
-                    try:
-                        stirng = single.GetMetaData(key).removesuffix(" ")
-                        stirng.encode("utf-8")
-                        if stirng in [
-                            "No study description",
-                            "No series description",
-                            "",
-                        ]:
-                            return "Unknown"
-                        else:
-                            return stirng
-                    except:
-                        return "Unknown"
-
-                study_description = get_meta("0008|1030")
-                series_description = get_meta("0008|103e")
-                series_modality = get_meta("0008|0060")
-                size_x = get_meta("0028|0011")
-                size_y = get_meta("0028|0010")
-                count = get_meta("0020|0013")
-                count = count if count != "Unknown" else 1
-
-                # some series image count = 0 ????
-                if int(count) == 0:
-                    continue
-
-                # series_id cannot be "" in blender selection
-                if series_id == "":
-                    series_id = "empty"
-
-                label = "{:<20} {:>1}".format(
-                    f"{study_description}>{series_description}({series_modality})",
-                    f"({size_x}x{size_y})x{count}",
+            # collect series in background, modal invokes again with the result
+            if not self.series_json:
+                return self.start_job(
+                    context, "read_series", {"filepath": self.filepath}
                 )
 
-                series_items[series_id] = label
-
+            series_items = {
+                item["id"]: item["label"] for item in json.loads(self.series_json)
+            }
             for series_id, label in series_items.items():
                 series_item = self.series_ids.add()
                 series_item.id = series_id
@@ -524,6 +779,9 @@ class ImportDataDialog(bpy.types.Operator):
     cache_infos = None
     added_ids = None
     process = None
+    worker = None
+    pending_config = None
+    channel = None
     job_dir = None
     progress_path = None
     result_path = None
@@ -537,6 +795,7 @@ class ImportDataDialog(bpy.types.Operator):
     frame_count: bpy.props.IntProperty()  # type: ignore
     channel_count: bpy.props.IntProperty()  # type: ignore
     label_count: bpy.props.IntProperty()  # type: ignore
+    dtype: bpy.props.StringProperty(default="<f4")  # type: ignore
     smooth: bpy.props.IntProperty(
         name="Smooth Size (Larger takes longer time)", default=0
     )  # type: ignore
@@ -571,6 +830,19 @@ class ImportDataDialog(bpy.types.Operator):
         max=1e6,
         default=0.01,
     )  # type: ignore
+    resample: bpy.props.BoolProperty(
+        name="Resample to Bioxel Size",
+        description="Resample voxels to bioxel size, otherwise keep the source voxels "
+        "and only resample when they do not fit in memory",
+        default=True,
+    )  # type: ignore
+    lod_count: bpy.props.IntProperty(
+        name="Preview Levels",
+        description="Number of half resolution levels precomputed for fast preview",
+        min=0,
+        max=3,
+        default=0,
+    )  # type: ignore
     remap: bpy.props.BoolProperty(name="Remap to 0~1", default=False)  # type: ignore
     split_channel: bpy.props.BoolProperty(
         name="Split Channels", default=False
@@ -591,17 +863,20 @@ class ImportDataDialog(bpy.types.Operator):
             {
                 "filepath": self.filepath,
                 "series_id": self.series_id,
-                "cache_dir": str(get_cache_dir() / "layers"),
+                "cache_dir": str(get_layers_cache_dir()),
                 "layer_name": self.layer_name,
                 "orig_shape": list(self.orig_shape),
                 "orig_spacing": list(self.orig_spacing),
                 "bioxel_size": self.bioxel_size,
+                "resample": self.resample,
+                "lod_count": self.lod_count,
                 "read_as": self.read_as,
                 "frame_source": self.frame_source,
                 "smooth": self.smooth,
                 "remap": self.remap,
                 "split_channel": self.split_channel,
                 "channel_count": self.channel_count,
+                "queue_depth": get_preferences().pipeline_depth,
             },
         )
 
@@ -624,11 +899,12 @@ class ImportDataDialog(bpy.types.Operator):
         bpy.context.workspace.status_text_set_internal(None)
         update_worker_progress(self, context)
 
-        if self.process.poll() is None:
+        if not poll_worker_process(self):
             return {"PASS_THROUGH"}
 
         context.window_manager.event_timer_remove(self._timer)
         remove_progress_bar_safe()
+        close_worker_channel(self)
         progress_update(context, 1.0)
 
         result = read_worker_json(self.result_path)
@@ -651,11 +927,8 @@ class ImportDataDialog(bpy.types.Operator):
             self.report({"ERROR"}, "Some thing went wrong.")
             return {"CANCELLED"}
 
-        is_first_import = len(get_layer_caches()) == 0
-        existing_data = get_layer_caches()
-        existing_data.extend(self.cache_infos)
-        set_layer_caches(existing_data)
-
+        set_last_import_profile(result.get("profile"), self.layer_name)
+        is_first_import = merge_layer_caches(self.cache_infos)
         setattr(context.window_manager, "bioxel_layer_library", self.added_ids[-1])
 
         if is_first_import:
@@ -671,11 +944,41 @@ class ImportDataDialog(bpy.types.Operator):
         return {"RUNNING_MODAL"}
 
     def draw(self, context):
-        layer_shape = get_layer_shape(
-            self.bioxel_size, self.orig_shape, self.orig_spacing
-        )
-
         orig_shape = tuple(self.orig_shape)
+        orig_count = orig_shape[0] * orig_shape[1] * orig_shape[2]
+
+        is_fallback = False
+        if self.resample:
+            layer_shape = get_layer_shape(
+                self.bioxel_size, self.orig_shape, self.orig_spacing
+            )
+        elif orig_count > MAX_BIOXEL_COUNT:
+            is_fallback = True
+            fit_bioxel_size = get_fit_bioxel_size(
+                orig_shape, tuple(self.orig_spacing), MAX_BIOXEL_COUNT
+            )
+            layer_shape = get_layer_shape(
+                fit_bioxel_size, self.orig_shape, self.orig_spacing
+            )
+        else:
+            layer_shape = orig_shape
+
+        memory_config = {
+            "read_as": self.read_as,
+            "frame_source": self.frame_source,
+            "label_count": self.label_count,
+            "split_channel": self.split_channel,
+            "remap": self.remap,
+            "smooth": self.smooth,
+            "queue_depth": get_preferences().pipeline_depth,
+            "lod_count": self.lod_count,
+        }
+        itemsize = np.dtype(self.dtype).itemsize
+        peak_memory = estimate_import_memory(
+            orig_shape, layer_shape, self.frame_count, self.channel_count,
+            itemsize, memory_config
+        )
+        available_memory = get_available_memory()
 
         # change shape as sequence or not
         channel_count = self.channel_count
@@ -712,13 +1015,17 @@ class ImportDataDialog(bpy.types.Operator):
         orig_shape_text = f"[{self.frame_count}, {orig_shape[0]},{orig_shape[1]},{orig_shape[2]}, {self.channel_count}]"
         layer_shape_text = f"{layer_count} x [{frame_count}, {layer_shape[0]},{layer_shape[1]},{layer_shape[2]}, {channel_count}]"
 
-        if bioxel_count > 100000000:
+        if bioxel_count > MAX_BIOXEL_COUNT:
             layer_shape_text += "**TOO LARGE!**"
 
         layout = self.layout
         panel = layout.box()
         panel.prop(self, "layer_name")
-        panel.prop(self, "bioxel_size")
+        panel.prop(self, "resample")
+        row = panel.row()
+        row.enabled = self.resample
+        row.prop(self, "bioxel_size")
+        panel.prop(self, "lod_count")
         row = panel.row()
         row.prop(self, "orig_spacing")
         panel.prop(self, "frame_source")
@@ -729,8 +1036,38 @@ class ImportDataDialog(bpy.types.Operator):
             panel.prop(self, "smooth")
 
         panel.label(text=f"Shape from {orig_shape_text} to {layer_shape_text}")
+        if is_fallback:
+            panel.label(
+                text=f"Too many voxels, will resample to bioxel size {fit_bioxel_size:.2f}",
+                icon="INFO",
+            )
         panel.label(text="Dimension Order: [Frame, X-axis, Y-axis, Z-axis, Channel]")
 
+        memory_text = f"Estimated peak memory: {peak_memory / 1024**3:.2f} GB"
+        if available_memory <= 0:
+            panel.label(text=memory_text)
+        elif fits_in_memory(peak_memory, available_memory):
+            panel.label(
+                text=f"{memory_text} of {available_memory / 1024**3:.2f} GB available"
+            )
+        else:
+            panel.label(
+                text=f"{memory_text} of {available_memory / 1024**3:.2f} GB available",
+                icon="ERROR",
+            )
+            fit_size = get_memory_fit_bioxel_size(
+                orig_shape, tuple(self.orig_spacing), self.frame_count,
+                self.channel_count, itemsize, memory_config,
+                available_memory * MEMORY_HEADROOM,
+            )
+            if fit_size is None:
+                panel.label(text="Source data does not fit in memory", icon="ERROR")
+            else:
+                panel.label(
+                    text=f"Not enough memory, try bioxel size {fit_size:.2f} or larger",
+                    icon="ERROR",
+                )
+
 
 class ExportVolumetricData(bpy.types.Operator):
     bl_idname = "bioxel.export_volumetric_data"
@@ -0,0 +1,481 @@
+import os
+from pathlib import Path
+
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+
+from ..bioxel.engine import estimate_import_memory, get_layer_shape, get_source_size
+from ..bioxel.parse import DICOM_EXTS, SUPPORT_EXTS, get_ext
+from ..cache import get_layers_cache_dir
+from ..utils import get_preferences
+from .io import (
+    close_worker_channel,
+    get_import_settings,
+    merge_layer_caches,
+    poll_worker_process,
+    read_worker_json,
+    read_worker_progress,
+    set_last_import_profile,
+    signal_worker_cancel,
+    start_worker_process,
+)
+
+# decoded volume, float32 copies and resized layers, relative to source size on disk
+JOB_MEMORY_FACTOR = 6
+# seconds between queue updates
+QUEUE_INTERVAL = 0.2
+
+FINISHED_STATES = {"DONE", "FAILED", "CANCELLED"}
+
+
+def get_batch_limits():
+    """Max concurrent jobs and memory budget in bytes from preferences."""
+    preferences = get_preferences()
+    max_jobs = preferences.batch_max_jobs
+    if max_jobs <= 0:
+        max_jobs = max(1, (os.cpu_count() or 2) // 2)
+    memory_budget = int(preferences.batch_memory_budget * 1024**3)
+    return max_jobs, memory_budget
+
+
+class BatchImportJob:
+    """
+    One source in the batch queue.
+
+    A job runs its worker commands one after another, "read_series" to
+    expand a DICOM folder into one job per series, then "read_meta" and
+    "import_layers". State is one of QUEUED, RUNNING, DONE, FAILED, CANCELLED.
+    """
+
+    def __init__(self, filepath: str, settings: dict, series_id=None, label=""):
+        self.filepath = filepath
+        self.settings = settings
+        self.series_id = series_id
+        self.label = label or Path(filepath).name
+        self.state = "QUEUED"
+        self.command = None
+        self.factor = 0.0
+        self.text = "Queued"
+        self.error = ""
+        self.memory = 0
+        self.meta = None
+        self.label_count = 0
+        self.dtype_kind = ""
+        self.dtype = None
+
+        self.is_cancelled = False
+        self.process = None
+        self.worker = None
+        self.pending_config = None
+        self.channel = None
+        self.job_dir = None
+        self.progress_path = None
+        self.result_path = None
+        self.cancel_path = None
+        self.log_path = None
+
+        # scanning a DICOM folder is slow, the guess is made once when queued
+        self.estimate_memory()
+
+    @property
+    def is_finished(self):
+        return self.state in FINISHED_STATES
+
+    def estimate_memory(self):
+        try:
+            self.memory = get_source_size(self.filepath) * JOB_MEMORY_FACTOR
+        except OSError:
+            self.memory = 0
+        return self.memory
+
+    def start(self):
+        self.state = "RUNNING"
+        self.text = "Starting..."
+        if self.series_id is None and get_ext(Path(self.filepath)) in DICOM_EXTS:
+            self.run("read_series", {"filepath": self.filepath})
+        else:
+            self.run(
+                "read_meta",
+                {"filepath": self.filepath, "series_id": self.series_id or ""},
+            )
+
+    def run(self, command: str, payload: dict):
+        self.command = command
+        start_worker_process(self, command, payload)
+
+    def cancel(self):
+        if self.state == "QUEUED":
+            self.finish("CANCELLED", "Cancelled")
+        elif self.state == "RUNNING":
+            signal_worker_cancel(self)
+            self.text = "Canceling..."
+
+    def finish(self, state: str, text: str):
+        close_worker_channel(self)
+        self.state = state
+        self.text = text
+        if state == "DONE":
+            self.factor = 1.0
+
+    def update(self):
+        """Poll the running command, returns new jobs split from this one."""
+        progress = read_worker_progress(self)
+        if progress:
+            self.factor = float(progress.get("factor", 0.0))
+            self.text = progress.get("text", "")
+
+        if not poll_worker_process(self):
+            return []
+
+        close_worker_channel(self)
+        result = read_worker_json(self.result_path)
+        if self.is_cancelled or (result and result.get("cancelled")):
+            self.finish("CANCELLED", "Cancelled")
+            return []
+
+        if not result:
+            self.error = f"Import worker failed. See log: {self.log_path}"
+            self.finish("FAILED", self.error)
+            return []
+
+        if not result.get("ok"):
+            print(result.get("traceback", ""))
+            self.error = result.get("error", "Import worker failed.")
+            self.finish("FAILED", self.error)
+            return []
+
+        if self.command == "read_series":
+            return self.on_series_read(result)
+        elif self.command == "read_meta":
+            self.on_meta_read(result)
+        else:
+            self.on_layers_built(result)
+        return []
+
+    def on_series_read(self, result):
+        series = result["series"]
+        if not series:
+            self.error = "Get no vaild series."
+            self.finish("FAILED", self.error)
+            return []
+
+        if self.settings["all_series"] and len(series) > 1:
+            # this job becomes a placeholder, each series is queued on its own
+            self.finish("DONE", f"Split into {len(series)} series")
+            return [
+                BatchImportJob(
+                    self.filepath,
+                    self.settings,
+                    series_id=item["id"] if item["id"] != "empty" else "",
+                    label=item["label"],
+                )
+                for item in series
+            ]
+
+        series_id = series[0]["id"]
+        self.series_id = series_id if series_id != "empty" else ""
+        self.run(
+            "read_meta", {"filepath": self.filepath, "series_id": self.series_id}
+        )
+        return []
+
+    def on_meta_read(self, result):
+        self.meta = result["meta"]
+        self.label_count = result["label_count"]
+        self.dtype_kind = result["dtype_kind"]
+        self.dtype = result["dtype"]
+        settings = self.settings
+
+        if settings["read_as"] == "LABEL":
+            if self.label_count > 100 or self.dtype_kind not in ["i", "u"]:
+                self.error = "Invaild label data."
+                self.finish("FAILED", self.error)
+                return
+            if self.label_count == 0:
+                self.error = "Get no label."
+                self.finish("FAILED", self.error)
+                return
+
+        orig_shape = self.meta["xyz_shape"]
+        orig_spacing, bioxel_size, _ = get_import_settings(
+            orig_shape, self.meta["spacing"]
+        )
+        if settings["bioxel_size"] > 0:
+            bioxel_size = settings["bioxel_size"]
+
+        # with meta known, the source size guess gives way to the estimate
+        layer_shape = orig_shape
+        if settings["resample"]:
+            layer_shape = get_layer_shape(bioxel_size, orig_shape, orig_spacing)
+        self.memory = estimate_import_memory(
+            orig_shape,
+            layer_shape,
+            self.meta["frame_count"],
+            self.meta["channel_count"],
+            np.dtype(self.dtype).itemsize,
+            {**settings, "label_count": self.label_count},
+        )
+
+        self.run(
+            "import_layers",
+            {
+                "filepath": self.filepath,
+                "series_id": self.series_id or "",
+                "cache_dir": str(get_layers_cache_dir()),
+                "layer_name": self.meta["description"],
+                "orig_shape": list(orig_shape),
+                "orig_spacing": list(orig_spacing),
+                "bioxel_size": bioxel_size,
+                "resample": settings["resample"],
+                "lod_count": settings["lod_count"],
+                "read_as": settings["read_as"],
+                "frame_source": settings["frame_source"],
+                "smooth": settings["smooth"],
+                "remap": settings["remap"],
+                "split_channel": settings["split_channel"],
+                "channel_count": self.meta["channel_count"],
+                "queue_depth": settings["queue_depth"],
+            },
+        )
+
+    def on_layers_built(self, result):
+        cache_infos = result.get("cache_infos")
+        if not cache_infos:
+            self.error = "Some thing went wrong."
+            self.finish("FAILED", self.error)
+            return
+
+        set_last_import_profile(result.get("profile"), self.label)
+        merge_layer_caches(cache_infos)
+        setattr(bpy.context.window_manager, "bioxel_layer_library", cache_infos[-1]["id"])
+        self.finish("DONE", f"{len(cache_infos)} layers imported")
+
+
+class BatchImportQueue:
+    """
+    Jobs of batch imports, run by a timer so they outlive the operator.
+
+    Jobs start in order while fewer than the max job count run and the
+    estimated memory of running jobs stays in budget. A job that is larger
+    than the whole budget still runs, but alone.
+    """
+
+    def __init__(self):
+        self.jobs = []
+
+    @property
+    def running_jobs(self):
+        return [job for job in self.jobs if job.state == "RUNNING"]
+
+    @property
+    def is_active(self):
+        return any(not job.is_finished for job in self.jobs)
+
+    def add(self, jobs):
+        self.jobs.extend(jobs)
+        if not bpy.app.timers.is_registered(_update_batch_queue):
+            bpy.app.timers.register(_update_batch_queue, first_interval=0.0)
+
+    def schedule(self):
+        max_jobs, memory_budget = get_batch_limits()
+        running = self.running_jobs
+        memory = sum(job.memory for job in running)
+
+        for job in self.jobs:
+            if job.state != "QUEUED":
+                continue
+            if len(running) >= max_jobs:
+                break
+            if running and memory_budget > 0 and memory + job.memory > memory_budget:
+                break
+            try:
+                job.start()
+            except Exception as e:
+                job.error = str(e)
+                job.finish("FAILED", job.error)
+                continue
+            running.append(job)
+            memory += job.memory
+
+    def update(self):
+        for job in self.running_jobs:
+            try:
+                new_jobs = job.update()
+            except Exception as e:
+                job.error = str(e)
+                job.finish("FAILED", job.error)
+                continue
+            if new_jobs:
+                index = self.jobs.index(job)
+                self.jobs[index + 1 : index + 1] = new_jobs
+
+        self.schedule()
+
+    def cancel(self, index=-1):
+        jobs = self.jobs if index < 0 else self.jobs[index : index + 1]
+        for job in jobs:
+            job.cancel()
+
+    def abort(self, text: str):
+        """Stop every unfinished job now, without waiting for its worker."""
+        for job in self.jobs:
+            if job.state == "RUNNING":
+                signal_worker_cancel(job)
+                if job.worker is not None:
+                    # the persistent worker would stay busy with a result nobody reads
+                    job.worker.stop()
+            if not job.is_finished:
+                job.finish("CANCELLED", text)
+
+    def clear_finished(self):
+        self.jobs = [job for job in self.jobs if not job.is_finished]
+
+
+BATCH_QUEUE = BatchImportQueue()
+
+
+def _update_batch_queue():
+    BATCH_QUEUE.update()
+
+    for window in bpy.context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == "NODE_EDITOR":
+                area.tag_redraw()
+
+    return QUEUE_INTERVAL if BATCH_QUEUE.is_active else None
+
+
+class BatchImportData(bpy.types.Operator):
+    bl_idname = "bioxel.batch_import_data"
+    bl_label = "Batch Import"
+    bl_description = "Import multiple volumetric data files or DICOM series with shared settings"
+
+    directory: bpy.props.StringProperty(subtype="DIR_PATH")  # type: ignore
+    files: bpy.props.CollectionProperty(
+        type=bpy.types.OperatorFileListElement
+    )  # type: ignore
+
+    read_as: bpy.props.EnumProperty(
+        name="Read as",
+        default="SCALAR",
+        items=[
+            ("SCALAR", "Scalar", ""),
+            ("LABEL", "Label", ""),
+            ("COLOR", "Color", ""),
+        ],
+    )  # type: ignore
+    all_series: bpy.props.BoolProperty(
+        name="All DICOM Series",
+        description="Import every series found in a DICOM folder, otherwise only the first",
+        default=True,
+    )  # type: ignore
+    bioxel_size: bpy.props.FloatProperty(
+        name="Bioxel Size",
+        description="Bioxel size shared by all imports, 0 picks one from each source spacing",
+        min=0,
+        max=1e2,
+        default=0,
+    )  # type: ignore
+    resample: bpy.props.BoolProperty(
+        name="Resample to Bioxel Size", default=True
+    )  # type: ignore
+    lod_count: bpy.props.IntProperty(
+        name="Preview Levels", min=0, max=3, default=0
+    )  # type: ignore
+    frame_source: bpy.props.EnumProperty(
+        name="Frame From",
+        items=[
+            ("-1", "First Frame", ""),
+            ("0", "Frames", ""),
+        ],
+    )  # type: ignore
+    smooth: bpy.props.IntProperty(
+        name="Smooth Size (Label only)", default=0
+    )  # type: ignore
+    remap: bpy.props.BoolProperty(name="Remap to 0~1", default=False)  # type: ignore
+    split_channel: bpy.props.BoolProperty(
+        name="Split Channels", default=False
+    )  # type: ignore
+
+    def invoke(self, context, event):
+        context.window_manager.fileselect_add(self)
+        return {"RUNNING_MODAL"}
+
+    def execute(self, context):
+        settings = {
+            "read_as": self.read_as,
+            "all_series": self.all_series,
+            "bioxel_size": self.bioxel_size,
+            "resample": self.resample,
+            "lod_count": self.lod_count,
+            "frame_source": self.frame_source,
+            "smooth": self.smooth,
+            "remap": self.remap,
+            "split_channel": self.split_channel,
+            "queue_depth": get_preferences().pipeline_depth,
+        }
+
+        jobs = []
+        dicom_dirs = set()
+        for file in self.files:
+            filepath = Path(self.directory, file.name).resolve()
+            ext = get_ext(filepath)
+            if ext not in SUPPORT_EXTS:
+                continue
+            # files of one DICOM folder are series of the same study, queue the folder once
+            if ext in DICOM_EXTS:
+                if filepath.parent in dicom_dirs:
+                    continue
+                dicom_dirs.add(filepath.parent)
+            jobs.append(BatchImportJob(str(filepath), settings))
+
+        if not jobs:
+            self.report({"WARNING"}, "No supported file selected.")
+            return {"CANCELLED"}
+
+        BATCH_QUEUE.add(jobs)
+        self.report({"INFO"}, f"Queued {len(jobs)} imports")
+        return {"FINISHED"}
+
+
+class CancelBatchImport(bpy.types.Operator):
+    bl_idname = "bioxel.cancel_batch_import"
+    bl_label = "Cancel Import"
+    bl_description = "Cancel a queued or running batch import job"
+
+    index: bpy.props.IntProperty(default=-1, options={"HIDDEN"})  # type: ignore
+
+    def execute(self, context):
+        BATCH_QUEUE.cancel(self.index)
+        return {"FINISHED"}
+
+
+class ClearBatchImport(bpy.types.Operator):
+    bl_idname = "bioxel.clear_batch_import"
+    bl_label = "Clear Finished"
+    bl_description = "Remove finished jobs from the batch import list"
+
+    def execute(self, context):
+        BATCH_QUEUE.clear_finished()
+        return {"FINISHED"}
+
+
+@persistent
+def _on_load_pre(*args):
+    # results would be merged into the newly loaded file, stop the batch instead
+    if bpy.app.timers.is_registered(_update_batch_queue):
+        bpy.app.timers.unregister(_update_batch_queue)
+    BATCH_QUEUE.abort("Cancelled, another file was loaded")
+
+
+def register():
+    bpy.app.handlers.load_pre.append(_on_load_pre)
+
+
+def unregister():
+    if _on_load_pre in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(_on_load_pre)
+    if bpy.app.timers.is_registered(_update_batch_queue):
+        bpy.app.timers.unregister(_update_batch_queue)
+    BATCH_QUEUE.cancel()
@@ -1,12 +1,28 @@
 from pathlib import Path
+import math
 import shutil
 
 import bpy
 
 from ..asset_library import ASSET_LIBRARY_MISSING, get_bioxel_asset_library_status
-from ..node import add_bioxel_node, get_layer_nodes, get_main_node_group
+from ..node import (
+    LAYER_NODES,
+    add_bioxel_node,
+    get_layer_node_id,
+    get_layer_nodes,
+    get_layer_nodes_by_id,
+    get_layer_objects_by_id,
+    get_main_node_group,
+    get_node_tree,
+)
 from ..utils import refresh_bioxel_panels
-from ..layer import get_layer_caches, set_layer_caches
+from ..bioxel.engine import get_lod_path
+from ..layer import get_layer_cache, get_layer_caches, set_layer_caches
+from ..cache import CACHE_STATUS, get_cache_status
+from ..preview import release_layer_previews
+
+# node width and height of a cell when adding many layers at once
+LAYER_GRID_SPACING = (250, 400)
 
 
 class RenameLayer(bpy.types.Operator):
@@ -20,8 +36,7 @@ class RenameLayer(bpy.types.Operator):
     new_name: bpy.props.StringProperty(name="New name", default="")  # type: ignore
 
     def invoke(self, context, event):
-        caches = get_layer_caches()
-        entry = next((c for c in caches if str(c.get("id", "")) == self.cache_id), None)
+        entry = get_layer_cache(self.cache_id)
         if entry:
             self.new_name = str(entry.get("name", ""))
         return context.window_manager.invoke_props_dialog(self)
@@ -32,10 +47,9 @@ class RenameLayer(bpy.types.Operator):
             return {"CANCELLED"}
 
         caches = get_layer_caches()
-        for c in caches:
-            if str(c.get("id", "")) == self.cache_id:
-                c["name"] = self.new_name
-                break
+        entry = get_layer_cache(self.cache_id)
+        if entry:
+            entry["name"] = self.new_name
 
         try:
             set_layer_caches(caches)
@@ -64,11 +78,10 @@ class DeleteLayer(bpy.types.Operator):
             self.report({"ERROR"}, "Missing cache id")
             return {"CANCELLED"}
 
-        caches = get_layer_caches()
-        new_list = [c for c in caches if str(c.get("id", "")) != self.cache_id]
-        removed = next(
-            (c for c in caches if str(c.get("id", "")) == self.cache_id), None
-        )
+        removed = get_layer_cache(self.cache_id)
+        new_list = [
+            c for c in get_layer_caches() if str(c.get("id", "")) != self.cache_id
+        ]
 
         try:
             set_layer_caches(new_list)
@@ -77,10 +90,45 @@ class DeleteLayer(bpy.types.Operator):
             self.report({"ERROR"}, f"Failed to update layer list: {e}")
             return {"CANCELLED"}
 
-        self.report({"INFO"}, "Layer removed")
+        if removed:
+            release_layer_previews(removed, new_list)
+
+        objs = get_layer_objects_by_id(self.cache_id)
+        if objs:
+            self.report({"WARNING"}, f"Layer removed, still used by {len(objs)} objects")
+        else:
+            self.report({"INFO"}, "Layer removed")
         return {"FINISHED"}
 
 
+def setup_layer_node(layer_node, entry):
+    """Fill the sockets of an O Layer node from a layer cache entry."""
+    layer_node.inputs["Path"].default_value = entry["path"]
+    layer_node.inputs["Name"].default_value = entry["name"]
+    layer_node.inputs["Shape"].default_value = entry["shape"]
+    layer_node.inputs["Min"].default_value = entry["min"]
+    layer_node.inputs["Max"].default_value = entry["max"]
+    layer_node.inputs["ID"].default_value = entry["id"]
+
+    # 将特定属性隐藏到hidden面板
+    hidden_sockets = ["Path", "Shape", "Min", "Max", "ID", "Animation"]
+
+    if entry["frame_count"] > 1:
+        layer_node.inputs["Frame Count"].default_value = entry["frame_count"]
+        layer_node.inputs["Animation"].default_value = True
+    else:
+        hidden_sockets = hidden_sockets + ["Frame Count", "Frame Offset", "Cycle"]
+
+    # 将特定属性隐藏到hidden面板
+    for socket_name in hidden_sockets:
+        if socket_name in layer_node.inputs:
+            layer_node.inputs[socket_name].hide = True
+
+    for socket_name in layer_node.outputs.keys():
+        if socket_name != entry["kind"].capitalize():
+            layer_node.outputs[socket_name].hide = True
+
+
 # 添加图层到节点图的操作器
 class AddLayerNode(bpy.types.Operator):
     """将选中的图层添加到几何节点图"""
@@ -98,12 +146,8 @@ class AddLayerNode(bpy.types.Operator):
             return {"CANCELLED"}
 
         # 获取图层数据
-        caches = get_layer_caches()
-
         # 查找目标图层
-        entry = next(
-            (c for c in caches if str(c.get("id", "")) == str(self.cache_id)), None
-        )
+        entry = get_layer_cache(self.cache_id)
 
         if not entry:
             self.report({"ERROR"}, "Layer not found")
@@ -117,35 +161,105 @@ class AddLayerNode(bpy.types.Operator):
             return {"CANCELLED"}
 
         layer_node.node_tree.make_local()
-        layer_node.inputs["Path"].default_value = entry["path"]
-        layer_node.inputs["Name"].default_value = entry["name"]
-        layer_node.inputs["Shape"].default_value = entry["shape"]
-        layer_node.inputs["Min"].default_value = entry["min"]
-        layer_node.inputs["Max"].default_value = entry["max"]
-        layer_node.inputs["ID"].default_value = entry["id"]
-
-        # 将特定属性隐藏到hidden面板
-        hidden_sockets = ["Path", "Shape", "Min", "Max", "ID", "Animation"]
-
-        if entry["frame_count"] > 1:
-            layer_node.inputs["Frame Count"].default_value = entry["frame_count"]
-            layer_node.inputs["Animation"].default_value = True
-        else:
-            hidden_sockets = hidden_sockets + ["Frame Count", "Frame Offset", "Cycle"]
+        setup_layer_node(layer_node, entry)
+        LAYER_NODES.add(layer_node.id_data, layer_node)
 
-        # 将特定属性隐藏到hidden面板
-        for socket_name in hidden_sockets:
-            if socket_name in layer_node.inputs:
-                layer_node.inputs[socket_name].hide = True
+        self.report({"INFO"}, f"Successfully created node: {entry['name']}")
+        return {"FINISHED"}
 
-        for socket_name in layer_node.outputs.keys():
-            if socket_name != entry["kind"].capitalize():
-                layer_node.outputs[socket_name].hide = True
 
-        self.report({"INFO"}, f"Successfully created node: {entry['name']}")
+class AddAllLayerNodes(bpy.types.Operator):
+    """Add an O Layer node for every layer in the library, laid out in a grid"""
+
+    bl_idname = "bioxel.add_all_layer_nodes"
+    bl_label = "Add All Layers"
+    bl_options = {"REGISTER", "UNDO"}
+
+    skip_existing: bpy.props.BoolProperty(
+        name="Skip Existing",
+        description="Skip layers that already have a node in this node tree",
+        default=True,
+    )  # type: ignore
+
+    @classmethod
+    def poll(cls, context):
+        return get_main_node_group(context) is not None
+
+    def execute(self, context):
+        status = get_bioxel_asset_library_status()
+        if status["code"] == ASSET_LIBRARY_MISSING:
+            self.report({"ERROR"}, status["message"])
+            return {"CANCELLED"}
+
+        node_group = get_main_node_group(context)
+        entries = get_layer_caches()
+        if self.skip_existing:
+            existing_ids = {get_layer_node_id(node) for node in get_layer_nodes(node_group)}
+            entries = [c for c in entries if str(c.get("id", "")) not in existing_ids]
+        # folders known to be missing would only add broken nodes
+        entries = [
+            c for c in entries
+            if (get_cache_status(c) or {}).get("exists", True)
+        ]
+
+        if not entries:
+            self.report({"INFO"}, "No layers to add")
+            return {"CANCELLED"}
+
+        # 只从节点库追加一次 node group，不走逐个节点的 operator
+        try:
+            node_tree = get_node_tree("O Layer", use_link=False)
+        except Exception as e:
+            self.report({"ERROR"}, f"Fail to load layer node: {e}")
+            return {"CANCELLED"}
+        node_tree.make_local()
+
+        for node in node_group.nodes:
+            node.select = False
+
+        origin = context.space_data.cursor_location
+        columns = math.ceil(math.sqrt(len(entries)))
+        for idx, entry in enumerate(entries):
+            layer_node = node_group.nodes.new("GeometryNodeGroup")
+            layer_node.node_tree = node_tree
+            layer_node.show_options = False
+            layer_node.width = LAYER_GRID_SPACING[0] - 50
+            row, col = divmod(idx, columns)
+            layer_node.location = (
+                origin.x + col * LAYER_GRID_SPACING[0],
+                origin.y - row * LAYER_GRID_SPACING[1],
+            )
+            setup_layer_node(layer_node, entry)
+            LAYER_NODES.add(node_group, layer_node)
+            layer_node.select = True
+
+        node_group.nodes.active = layer_node
+        self.report({"INFO"}, f"Added {len(entries)} layer nodes")
         return {"FINISHED"}
 
 
+def retarget_layer_nodes(cache_id, old_path: str, new_path: str):
+    """
+    Point every O Layer node of a layer cache at new_path, keeping its preview level.
+
+    - Nodes are looked up by their ID through the layer node index, nodes
+      without an ID value are matched when they still point at old_path.
+    """
+    nodes = get_layer_nodes_by_id(cache_id)
+    for node in get_layer_nodes_by_id(""):
+        level = node.get("bioxel_lod", 0)
+        node_path = getattr(node.inputs.get("Path"), "default_value", "")
+        if node_path and node_path == get_lod_path(old_path, level):
+            nodes.append(node)
+
+    for node in nodes:
+        path_socket = node.inputs.get("Path")
+        if path_socket is None:
+            continue
+        level = node.get("bioxel_lod", 0)
+        path_socket.default_value = get_lod_path(new_path, level)
+
+
 class RelocatePath(bpy.types.Operator):
     """Locate and update the missing layer folder, and update all related nodes"""
 
@@ -180,7 +294,7 @@ class RelocatePath(bpy.types.Operator):
             return {"CANCELLED"}
 
         caches = get_layer_caches()
-        entry = next((c for c in caches if str(c.get("id", "")) == self.cache_id), None)
+        entry = get_layer_cache(self.cache_id)
         if not entry:
             self.report({"ERROR"}, "Layer not found")
             return {"CANCELLED"}
@@ -194,14 +308,10 @@ class RelocatePath(bpy.types.Operator):
         entry["path"] = new_path
 
         set_layer_caches(caches)
+        CACHE_STATUS.check([entry])
         refresh_bioxel_panels(context)
 
-        # 更新所有 node group 中 O Layer 节点的 Path
-        for node_group in bpy.data.node_groups:
-            for node in get_layer_nodes(node_group):
-                node_path = getattr(node.inputs.get("Path"), "default_value")
-                if node_path and node_path == old_path:
-                    node.inputs["Path"].default_value = new_path
+        retarget_layer_nodes(entry["id"], old_path, new_path)
 
         self.report({"INFO"}, f"Cache path updated: {new_path}")
         return {"FINISHED"}
@@ -245,12 +355,11 @@ class SaveLayer(bpy.types.Operator):
             return {"CANCELLED"}
 
         caches = get_layer_caches()
-        entry = next((c for c in caches if str(c.get("id")) == self.cache_id), None)
-        cache_id = entry.get("id")
-
+        entry = get_layer_cache(self.cache_id)
         if not entry:
             self.report({"ERROR"}, "Layer not found")
             return {"CANCELLED"}
+        cache_id = entry.get("id")
 
         old_path = entry["path"]
         src_path = bpy.path.abspath(old_path)
@@ -280,13 +389,10 @@ class SaveLayer(bpy.types.Operator):
             entry["path"] = new_path
 
             set_layer_caches(caches)
+            CACHE_STATUS.check([entry])
             refresh_bioxel_panels(context)
 
-            # 遍历所有 node group
-            for node_group in bpy.data.node_groups:
-                for node in get_layer_nodes(node_group):
-                    if cache_id == getattr(node.inputs.get("ID"), "default_value"):
-                        node.inputs["Path"].default_value = new_path
+            retarget_layer_nodes(cache_id, old_path, new_path)
 
             self.report({"INFO"}, f"Layer cached to {dst_dir}")
             return {"FINISHED"}
@@ -295,6 +401,47 @@ class SaveLayer(bpy.types.Operator):
             return {"CANCELLED"}
 
 
+class SetLayerLOD(bpy.types.Operator):
+    """Switch an O Layer node between its precomputed preview levels"""
+
+    bl_idname = "bioxel.set_layer_lod"
+    bl_label = "Set Preview Level"
+    bl_options = {"REGISTER", "UNDO"}
+
+    node_name: bpy.props.StringProperty(options={"HIDDEN"})  # type: ignore
+    level: bpy.props.IntProperty(name="Level", min=0, default=0)  # type: ignore
+
+    def execute(self, context):
+        node_group = get_main_node_group(context)
+        node = node_group.nodes.get(self.node_name) if node_group else None
+        if not node:
+            self.report({"ERROR"}, f"Node '{self.node_name}' not found.")
+            return {"CANCELLED"}
+
+        cache_id = getattr(node.inputs.get("ID"), "default_value", "")
+        entry = get_layer_cache(cache_id)
+        if not entry:
+            self.report({"ERROR"}, "Layer not found")
+            return {"CANCELLED"}
+
+        lod = next(
+            (l for l in entry.get("lods", []) if l["level"] == self.level), None
+        )
+        if self.level > 0 and lod is None:
+            self.report({"ERROR"}, f"Preview level {self.level} is not cached")
+            return {"CANCELLED"}
+
+        node.inputs["Path"].default_value = get_lod_path(entry["path"], self.level)
+        node.inputs["Shape"].default_value = lod["shape"] if lod else entry["shape"]
+        node["bioxel_lod"] = self.level
+
+        # precomputed level replaces the runtime resample
+        if self.level > 0 and "Resample" in node.inputs:
+            node.inputs["Resample"].default_value = False
+
+        return {"FINISHED"}
+
+
 class SelectAndFocusNode(bpy.types.Operator):
     """Select and focus the specified node in the current node tree"""
 
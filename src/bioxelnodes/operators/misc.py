@@ -11,6 +11,7 @@ from ..asset_library import (
     add_bioxel_asset_library,
     get_bioxel_asset_library_status,
 )
+from ..cache import start_cache_eviction
 from ..constants import LATEST_NODE_LIB_PATH
 from ..utils import (
     get_all_layer_objs,
@@ -45,6 +46,17 @@ class CleanTemp(bpy.types.Operator):
         return {"RUNNING_MODAL"}
 
 
+class EvictCache(bpy.types.Operator):
+    bl_idname = "bioxel.evict_cache"
+    bl_label = "Free Cache Space"
+    bl_description = "Measure layer cache usage and remove least recently used caches not used by recent files until it fits the quota"
+
+    def execute(self, context):
+        start_cache_eviction()
+        self.report({"INFO"}, "Scanning layer cache in background.")
+        return {"FINISHED"}
+
+
 class RenderSettingPreset(bpy.types.Operator):
     bl_idname = "bioxel.render_setting_preset"
     bl_label = "Render Setting Presets"
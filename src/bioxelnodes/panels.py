@@ -1,4 +1,3 @@
-from pathlib import Path
 import bpy
 
 from .asset_library import (
@@ -8,11 +7,25 @@ from .asset_library import (
     has_bioxel_asset_library,
 )
 from .node import get_layer_nodes, get_main_node_group
-from .utils import load_icon
-from .layer import get_layer_caches
-from .operators.io import ImportAsColor, ImportAsLabel, ImportAsScalar, ImportData
+from .preview import get_histogram_icon
+from .layer import get_layer_cache
+from .cache import get_cache_status
+from .operators.io import (
+    LAST_IMPORT_PROFILE,
+    ImportAsColor,
+    ImportAsLabel,
+    ImportAsScalar,
+    ImportData,
+)
+from .operators.io_batch import (
+    BATCH_QUEUE,
+    BatchImportData,
+    CancelBatchImport,
+    ClearBatchImport,
+)
 from .operators.misc import AddAssetLibrary, Help, RenderSettingPreset
 from .operators.layer import (
+    AddAllLayerNodes,
     AddLayerNode,
     DeleteLayer,
     RelocatePath,
@@ -139,12 +152,13 @@ class LibraryPanel(BioxelPanelBase, bpy.types.Panel):
     def draw(self, context):
         layout = self.layout
         wm = context.window_manager
-        caches = get_layer_caches()
-
         row = layout.row()
         row.scale_y = 2.0
         row.operator(ImportData.bl_idname, icon="IMPORT")
+        row.operator(BatchImportData.bl_idname, text="", icon="DOCUMENTS")
         # row.menu(ImportMenu.bl_idname, icon="IMPORT", text="Import")
+        if LAST_IMPORT_PROFILE:
+            draw_import_profile(layout)
         layout.separator()
         layout.template_icon_view(
             bpy.context.window_manager,
@@ -153,16 +167,18 @@ class LibraryPanel(BioxelPanelBase, bpy.types.Panel):
             scale=10.0,
             scale_popup=6.0,
         )
+        layout.operator(AddAllLayerNodes.bl_idname, icon="NODETREE")
 
         selected_id = getattr(wm, "bioxel_layer_library", None)
         selected_id = None if selected_id == "nothing_found" else selected_id
-        entry = next((c for c in caches if c.get("id") == selected_id), None)
+        entry = get_layer_cache(selected_id)
         if entry:
-            cache_id = entry["id"]
             path = entry["path"]
             name = entry.get("name", "?")
             kind = entry.get("kind", "?")
-            path_exists = Path(bpy.path.abspath(path)).exists()
+            # checked in the background, unknown folders count as present
+            status = get_cache_status(entry)
+            path_exists = status["exists"] if status else True
 
             layout.prop(wm, "bioxel_snapshot_z", text="Z Slice", slider=True)
             layout.separator()
@@ -200,13 +216,79 @@ class LibraryPanel(BioxelPanelBase, bpy.types.Panel):
             meta_box.label(text=f"Name: {name}")
             meta_box.label(text=f"Path: {path}")
             meta_box.label(text=f"Kind: {kind}")
+            if status:
+                meta_box.label(text=f"Size: {status['size'] / 1024**2:.1f} MB")
             meta_box.label(
                 text=f"Dims: [{entry.get('frame_count',1)},{tuple(entry.get('shape',''))},{entry.get('channel_count',1)}]"
             )
             if kind in ["scalar", "color", "vector"]:
-                path = Path(bpy.path.abspath(entry["path"]))
-                histogram = load_icon(
-                    path / "histogram.png", f"{cache_id}_histogram")
-                meta_box.template_icon(histogram, scale=10.0)
+                meta_box.template_icon(get_histogram_icon(entry), scale=10.0)
+                if "histogram" in entry:
+                    low, high = entry["histogram"]["range"]
+                    meta_box.label(text=f"Histogram: {low:.4g} ~ {high:.4g} (log)")
         else:
             layout.label(text="No layer selected", icon="QUESTION")
+
+
+def draw_import_profile(layout):
+    """Collapsible stage timings of the last import."""
+    header, body = layout.panel("bioxel_import_profile", default_closed=True)
+    header.label(text="Last import profile", icon="TIME")
+    if body is None:
+        return
+
+    profile = LAST_IMPORT_PROFILE
+    box = body.box()
+    box.label(text=f"Source: {profile.get('name', '?')}")
+    box.label(text=f"Total: {profile['wall']:.2f}s wall, {profile['cpu']:.2f}s CPU")
+    box.label(text=f"Read {profile['bytes_read'] / 1024**2:.1f} MB, "
+              f"written {profile['bytes_written'] / 1024**2:.1f} MB")
+    box.label(text=f"Worker peak memory: {profile['peak_rss'] / 1024**3:.2f} GB")
+
+    col = box.column(align=True)
+    for stage in sorted(profile["stages"], key=lambda s: s["wall"], reverse=True):
+        text = f"{stage['name']}: {stage['wall']:.2f}s wall, {stage['cpu']:.2f}s CPU"
+        if stage["count"] > 1:
+            text += f" ({stage['count']}x)"
+        col.label(text=text)
+    if profile.get("trace_path"):
+        box.label(text=f"Trace: {profile['trace_path']}")
+
+
+class BatchImportPanel(BioxelPanelBase, bpy.types.Panel):
+    bl_label = "Batch Import"
+    bl_idname = "BIOXEL_PT_batch_import_panel"
+    bl_order = 3
+
+    @classmethod
+    def poll(cls, context):
+        return super().poll(context) and len(BATCH_QUEUE.jobs) > 0
+
+    def draw(self, context):
+        layout = self.layout
+        icons = {
+            "QUEUED": "SORTTIME",
+            "RUNNING": "PLAY",
+            "DONE": "CHECKMARK",
+            "FAILED": "ERROR",
+            "CANCELLED": "CANCEL",
+        }
+
+        for index, job in enumerate(BATCH_QUEUE.jobs):
+            box = layout.box()
+            row = box.row(align=True)
+            row.label(text=job.label, icon=icons[job.state])
+            if not job.is_finished:
+                row.operator(
+                    CancelBatchImport.bl_idname, text="", icon="X"
+                ).index = index
+
+            if job.state == "RUNNING":
+                box.progress(factor=job.factor, type="BAR", text=job.text)
+            else:
+                box.label(text=job.text)
+
+        row = layout.row(align=True)
+        if BATCH_QUEUE.is_active:
+            row.operator(CancelBatchImport.bl_idname, text="Cancel All").index = -1
+        row.operator(ClearBatchImport.bl_idname, icon="TRASH")
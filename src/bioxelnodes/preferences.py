@@ -1,6 +1,8 @@
 import bpy
 from pathlib import Path
 
+from .cache import CACHE_USAGE
+
 
 class BioxelNodesPreferences(bpy.types.AddonPreferences):
     bl_idname = __package__
@@ -11,7 +13,78 @@ class BioxelNodesPreferences(bpy.types.AddonPreferences):
         default=str(Path(Path.home(), '.bioxel'))
     )  # type: ignore
 
+    cache_quota: bpy.props.FloatProperty(
+        name="Cache Quota (GB)",
+        description="Least recently used layer caches no longer used by any recent file are "
+        "removed above this size, 0 turns removal off",
+        min=0,
+        default=0,
+    )  # type: ignore
+
+    use_persistent_worker: bpy.props.BoolProperty(
+        name="Keep Import Worker Running",
+        description="Reuse one background Blender for imports instead of starting a new one each time",
+        default=True,
+    )  # type: ignore
+
+    worker_runtime: bpy.props.EnumProperty(
+        name="Import Worker",
+        description="Process to run imports in",
+        items=[
+            ("BLENDER", "Background Blender", "Run imports in a background Blender"),
+            ("PYTHON", "Python", "Run imports in Blender's Python without starting Blender, "
+             "starts faster"),
+        ],
+        default="BLENDER",
+    )  # type: ignore
+
+    pipeline_depth: bpy.props.IntProperty(
+        name="Import Prefetch Frames",
+        description="Frames read ahead while the previous ones are resampled and written, "
+        "0 processes frames one after another",
+        min=0,
+        max=16,
+        default=2,
+    )  # type: ignore
+
+    export_import_trace: bpy.props.BoolProperty(
+        name="Export Import Trace",
+        description="Save the stage timings of each import as a Chrome trace (trace.json) "
+        "in the import job folder",
+        default=False,
+    )  # type: ignore
+
+    batch_max_jobs: bpy.props.IntProperty(
+        name="Concurrent Batch Imports",
+        description="Batch import jobs running at the same time, 0 uses half of the CPU cores",
+        min=0,
+        default=0,
+    )  # type: ignore
+
+    batch_memory_budget: bpy.props.FloatProperty(
+        name="Batch Import Memory (GB)",
+        description="Estimated memory all running batch import jobs may use, 0 means unlimited",
+        min=0,
+        default=8,
+    )  # type: ignore
+
     def draw(self, context):
         layout = self.layout
         layout.label(text="Configuration")
         layout.prop(self, 'cache_dir')
+        layout.prop(self, 'cache_quota')
+        layout.prop(self, 'worker_runtime')
+        layout.prop(self, 'use_persistent_worker')
+        layout.prop(self, 'pipeline_depth')
+        layout.prop(self, 'export_import_trace')
+        layout.prop(self, 'batch_max_jobs')
+        layout.prop(self, 'batch_memory_budget')
+
+        box = layout.box()
+        if CACHE_USAGE["time"]:
+            size_gb = CACHE_USAGE["size"] / 1024**3
+            box.label(
+                text=f"Layer cache usage: {size_gb:.2f} GB in {CACHE_USAGE['count']} layers")
+        else:
+            box.label(text="Layer cache usage: not scanned yet")
+        box.operator("bioxel.evict_cache", icon="FILE_REFRESH")
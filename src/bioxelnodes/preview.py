@@ -0,0 +1,217 @@
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+
+import bpy
+import numpy as np
+
+from .bioxel.engine import get_snapshot_slice, get_snapshot_window
+from .cache import get_cache_status
+from .constants import PREVIEW_COLLECTIONS
+
+# previews kept in the collection over all layers, raised to fit the gallery
+MAX_PREVIEWS = 256
+# rendered Z slices kept per layer cache
+SLICE_CACHE_SIZE = 8
+# memory-mapped snapshot.npy files kept open
+SNAPSHOT_CACHE_SIZE = 32
+
+
+def get_cache_owner(cache) -> str:
+    """
+    Preview owner of a layer cache, the hash of its folder.
+
+    Layer entries pointing at the same folder share their previews, a
+    relocated layer gets fresh ones.
+    """
+    # normalized without touching the filesystem, this runs on every redraw
+    path = os.path.normcase(os.path.normpath(bpy.path.abspath(cache["path"])))
+    return hashlib.sha1(path.encode("utf-8")).hexdigest()[:16]
+
+
+class PreviewManager:
+    """
+    Bounded LRU over PREVIEW_COLLECTIONS["layers"].
+
+    - Every preview belongs to a layer cache folder (owner), release(owner)
+      drops them all and closes the memory-mapped snapshot.
+    - Above max(MAX_PREVIEWS, reserved) previews, the least recently used
+      ones are removed; the gallery reserves one icon per layer so it never
+      evicts its own icons while drawing.
+    - Slices of one owner are also limited to SLICE_CACHE_SIZE, scrubbing a
+      layer does not push other layers' icons out.
+    """
+
+    def __init__(self):
+        # preview key -> (owner, is_slice), most recently used last
+        self.keys = OrderedDict()
+        # owner -> (memory-mapped snapshot, display window)
+        self.snapshots = OrderedDict()
+        self.reserved = 0
+
+    @property
+    def collection(self):
+        return PREVIEW_COLLECTIONS.get("layers")
+
+    def get(self, key: str):
+        """icon_id of a kept preview, None when it is not there."""
+        pcoll = self.collection
+        if pcoll is None or key not in pcoll:
+            self.keys.pop(key, None)
+            return None
+        if key in self.keys:
+            self.keys.move_to_end(key)
+        return pcoll[key].icon_id
+
+    def add(self, key: str, owner: str, is_slice: bool = False):
+        self.keys[key] = (owner, is_slice)
+        self.keys.move_to_end(key)
+
+        if is_slice:
+            slice_keys = [k for k, (o, s) in self.keys.items() if o == owner and s]
+            for old_key in slice_keys[:-SLICE_CACHE_SIZE]:
+                self.remove(old_key)
+
+        limit = max(MAX_PREVIEWS, self.reserved)
+        while len(self.keys) > limit:
+            self.remove(next(iter(self.keys)))
+
+    def new(self, key: str, owner: str, array: np.ndarray, is_slice: bool = False):
+        """Create a preview from an (X, Y, 3) array, returns its icon_id."""
+        pcoll = self.collection
+        if pcoll is None:
+            return "TEXTURE"
+
+        preview = pcoll.new(key)
+        set_preview_pixels(preview, array)
+        self.add(key, owner, is_slice)
+        return preview.icon_id
+
+    def load(self, key: str, owner: str, filepath: Path):
+        """Load an existing image file as preview, returns its icon_id or None."""
+        pcoll = self.collection
+        if pcoll is None:
+            return None
+
+        preview = pcoll.load(key, str(filepath), "IMAGE")
+        self.add(key, owner)
+        return preview.icon_id
+
+    def remove(self, key: str):
+        self.keys.pop(key, None)
+        pcoll = self.collection
+        if pcoll is not None and key in pcoll:
+            del pcoll[key]
+
+    def release(self, owner: str):
+        """Drop every preview and the snapshot of a layer cache folder."""
+        for key in [k for k, (o, _) in self.keys.items() if o == owner]:
+            self.remove(key)
+        self.snapshots.pop(owner, None)
+
+    def clear(self):
+        """Forget everything, the collection itself is removed on unregister."""
+        self.keys.clear()
+        self.snapshots.clear()
+        self.reserved = 0
+
+    def get_snapshot(self, cache, owner: str):
+        """
+        Memory-mapped snapshot.npy of a layer cache and its display window.
+
+        Returns (None, None) when the cache has no snapshot.
+        """
+        if owner in self.snapshots:
+            self.snapshots.move_to_end(owner)
+            return self.snapshots[owner]
+
+        path = Path(bpy.path.abspath(cache["path"])) / "snapshot.npy"
+        try:
+            snapshot = np.load(str(path), mmap_mode="r")
+        except (OSError, ValueError):
+            return None, None
+
+        # caches written before the window was stored compute it once here
+        window = cache.get("snapshot_window", False)
+        if window is False:
+            window = get_snapshot_window(snapshot, cache.get("kind", "scalar"))
+
+        self.snapshots[owner] = (snapshot, window)
+        while len(self.snapshots) > SNAPSHOT_CACHE_SIZE:
+            self.snapshots.popitem(last=False)
+        return snapshot, window
+
+
+PREVIEWS = PreviewManager()
+
+
+def set_preview_pixels(preview, array: np.ndarray):
+    """Fill image and icon of an ImagePreview with an (X, Y, 3) slice, first row on top."""
+    h, w = array.shape[0], array.shape[1]
+    # preview pixels start at the bottom-left corner
+    rgba = np.ones((h, w, 4), dtype=np.float32)
+    rgba[:, :, :3] = array[::-1]
+    pixels = rgba.ravel()
+
+    preview.image_size = (w, h)
+    preview.image_pixels_float.foreach_set(pixels)
+    preview.icon_size = (w, h)
+    preview.icon_pixels_float.foreach_set(pixels)
+
+
+def get_snapshot_icon(cache, z: float):
+    """
+    Icon of the Z slice of a layer snapshot, rendered on first use.
+
+    Slices are rasterized from the memory-mapped snapshot.npy and pushed
+    into the preview collection through PREVIEWS.
+    """
+    owner = get_cache_owner(cache)
+    if owner not in PREVIEWS.snapshots:
+        # open the snapshot only once the folder is known to be there
+        status = get_cache_status(cache)
+        if not status or not status["exists"]:
+            return "TEXTURE"
+    snapshot, window = PREVIEWS.get_snapshot(cache, owner)
+    if snapshot is None:
+        return "TEXTURE"
+
+    zidx = int(z * (snapshot.shape[2] - 1))
+    key = f"{owner}_{zidx}"
+    icon = PREVIEWS.get(key)
+    if icon is None:
+        icon = PREVIEWS.new(key, owner, get_snapshot_slice(snapshot, zidx, window),
+                            is_slice=True)
+    return icon
+
+
+def get_histogram_icon(cache):
+    owner = get_cache_owner(cache)
+    key = f"{owner}_histogram"
+    icon = PREVIEWS.get(key)
+    if icon is None:
+        status = get_cache_status(cache)
+        if not status or not status["histogram"]:
+            return "TEXTURE"
+        histogram_path = Path(bpy.path.abspath(cache["path"])) / "histogram.png"
+        icon = PREVIEWS.load(key, owner, histogram_path)
+    return icon if icon is not None else "TEXTURE"
+
+
+def reserve_previews(count: int):
+    """Keep at least count previews, the gallery shows one icon per layer."""
+    PREVIEWS.reserved = count
+
+
+def release_layer_previews(cache, caches=()):
+    """
+    Drop the previews of a removed layer entry.
+
+    Kept when another entry in caches still points at the same folder.
+    """
+    owner = get_cache_owner(cache)
+    if any(get_cache_owner(other) == owner for other in caches
+           if other.get("id") != cache.get("id")):
+        return
+    PREVIEWS.release(owner)
@@ -1,35 +1,57 @@
-from pathlib import Path
 import bpy
+from bpy.app.handlers import persistent
 
-from .operators.layer import SelectAndFocusNode
-from .utils import load_icon
-from .layer import get_layer_caches, set_layer_caches
+from .operators.layer import SelectAndFocusNode, SetLayerLOD
+from .layer import get_layer_cache, get_layer_caches, set_layer_caches
+from .preview import get_snapshot_icon, reserve_previews
 
+# seconds without slider changes before the Z positions are written to the file
+SNAPSHOT_Z_SAVE_DELAY = 0.5
 
-def get_snapshot_icon(cache, z: float):
-    cache_id = str(cache["id"])
-    shape = (64, 64, 32)
-    zidx = int(z * (shape[2] - 1))
+# cache id -> Z position changed by the slider and not yet saved in bioxel_layers
+_snapshot_z = {}
 
-    path = Path(bpy.path.abspath(cache["path"]))
-    return load_icon(path / f"snapshot_{zidx}.png", f"{cache_id}_{zidx}")
+
+def get_snapshot_z(cache) -> float:
+    return _snapshot_z.get(str(cache.get("id", "")), cache.get("snapshot_z", 0.5))
+
+
+def save_snapshot_z():
+    """Write pending Z positions into bioxel_layers in one go."""
+    if not _snapshot_z:
+        return
+
+    for cache_id, z in _snapshot_z.items():
+        cache = get_layer_cache(cache_id)
+        if cache:
+            cache["snapshot_z"] = z
+    _snapshot_z.clear()
+    set_layer_caches(get_layer_caches())
+
+
+def _save_snapshot_z_timer():
+    try:
+        save_snapshot_z()
+    except Exception as e:
+        print(f"Failed to save snapshot positions: {e}")
+    return None
 
 
 def _bioxel_layer_items(self, context):
     """
     EnumProperty items callback: 从 get_layer_caches 构造枚举项。
-    使用 PREVIEWS 加载每个 layer 的 thumbnail_png（如果存在）并返回 icon_id。
+    每个 layer 的图标由 snapshot.npy 按当前 Z 切片即时生成。
     """
     items = []
     caches = get_layer_caches()
+    # every gallery icon stays in the preview LRU while it is shown
+    reserve_previews(len(caches) * 2)
 
     for idx, cache in enumerate(caches):
         cache_id = str(cache["id"])
         name = cache.get("name", f"Layer ?")
         description = cache.get("kind", "?")
-        z = cache.get("snapshot_z", 0.5)
-        icon = get_snapshot_icon(cache, z)
-        # 在这个context下，只能加载无法生成。
+        icon = get_snapshot_icon(cache, get_snapshot_z(cache))
         items.append((cache_id, name, description, icon, idx))
 
     if not items:
@@ -42,21 +64,18 @@ def _bioxel_layer_items(self, context):
 def _update_layer_gallery(self, context):
     wm = context.window_manager
     selected_id = getattr(wm, "bioxel_layer_library", None)
-    cache = next(
-        (c for c in get_layer_caches() if str(c.get("id", "")) == str(selected_id)),
-        None,
-    )
-    z = cache.get("snapshot_z", 0.5) if cache else 0.5
+    cache = get_layer_cache(selected_id)
+    z = get_snapshot_z(cache) if cache else 0.5
     setattr(wm, "bioxel_snapshot_z", z)
 
 
 def _update_snapshot_z(self, context):
     """
-    update callback for WindowManager.bioxel_thumb_z
-    - write a slice PNG from the saved .npy
-    - update PREVIEWS entry for the selected layer
-    - force template_icon_view to refresh by briefly cycling the EnumProperty value
-    - force UI redraw
+    update callback for WindowManager.bioxel_snapshot_z
+    - keep the Z position of the selected layer in memory, the gallery renders
+      the new slice from snapshot.npy on the next redraw
+    - bioxel_layers is written once the slider rests for SNAPSHOT_Z_SAVE_DELAY
+      or before the file is saved, not on every step of a drag
     """
     wm = context.window_manager
     selected_id = getattr(wm, "bioxel_layer_library", None)
@@ -64,20 +83,19 @@ def _update_snapshot_z(self, context):
     if not selected_id or selected_id == "nothing_found":
         return
 
-    try:
-        selected_id = int(selected_id)
-    except Exception:
+    cache = get_layer_cache(selected_id)
+    if not cache:
         return
 
-    caches = get_layer_caches()
     z = getattr(wm, "bioxel_snapshot_z", 0.5)
+    if z == get_snapshot_z(cache):
+        return
+    _snapshot_z[str(selected_id)] = z
 
-    for cache in caches:
-        if int(cache.get("id", -1)) == selected_id:
-            cache["snapshot_z"] = z
-            break
-
-    set_layer_caches(caches)
+    # restart the delay, the drag is still going on
+    if bpy.app.timers.is_registered(_save_snapshot_z_timer):
+        bpy.app.timers.unregister(_save_snapshot_z_timer)
+    bpy.app.timers.register(_save_snapshot_z_timer, first_interval=SNAPSHOT_Z_SAVE_DELAY)
 
 
 class BIOXEL_Series(bpy.types.PropertyGroup):
@@ -128,7 +146,47 @@ class BIOXEL_UL_layer_nodes(bpy.types.UIList):
         col1.prop(scale_socket, "default_value", text="")
         col2.label(text=name)
 
+        cache_id = str(node.inputs["ID"].default_value) if "ID" in node.inputs else ""
+        cache = get_layer_cache(cache_id)
+        lods = cache.get("lods", []) if cache else []
+        if lods:
+            level = node.get("bioxel_lod", 0)
+            op = col2.operator(SetLayerLOD.bl_idname, text=f"LOD {level}", emboss=True)
+            op.node_name = node.name
+            op.level = (level + 1) % (len(lods) + 1)
+
         op = col2.operator(
             SelectAndFocusNode.bl_idname, text="", icon="RESTRICT_SELECT_OFF", emboss=True
         )
         op.node_name = node.name
+
+
+@persistent
+def _on_save_pre(*args):
+    try:
+        save_snapshot_z()
+    except Exception as e:
+        print(f"Failed to save snapshot positions: {e}")
+
+
+@persistent
+def _on_load_pre(*args):
+    # positions of the closed file are dropped with it
+    _snapshot_z.clear()
+    if bpy.app.timers.is_registered(_save_snapshot_z_timer):
+        bpy.app.timers.unregister(_save_snapshot_z_timer)
+
+
+def register():
+    bpy.app.handlers.save_pre.append(_on_save_pre)
+    bpy.app.handlers.load_pre.append(_on_load_pre)
+
+
+def unregister():
+    if _on_save_pre in bpy.app.handlers.save_pre:
+        bpy.app.handlers.save_pre.remove(_on_save_pre)
+    if _on_load_pre in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(_on_load_pre)
+    if bpy.app.timers.is_registered(_save_snapshot_z_timer):
+        bpy.app.timers.unregister(_save_snapshot_z_timer)
+    _snapshot_z.clear()
@@ -3,10 +3,9 @@ from ast import literal_eval
 
 import shutil
 import bpy
-import numpy as np
 
 from .node import get_nodes_by_type
-from .constants import LATEST_NODE_LIB_PATH, NODE_LIB_DIRPATH, PREVIEW_COLLECTIONS
+from .constants import LATEST_NODE_LIB_PATH, NODE_LIB_DIRPATH
 
 
 def copy_to_dir(source_path, dir_path, new_name=None, exist_ok=True):
@@ -279,53 +278,6 @@ def local_lib_not_updated():
     return False
 
 
-def ndarray_to_png(array: np.ndarray, save_path: str):
-    """
-    Create a PNG from a 2D or 3-channel slice array using Blender API.
-    slice_arr expected shape: (W, H) or (W, H, 1) or (W,H,3). Values assumed numeric.
-
-    The function:
-    - Converts single-channel arrays to RGB by repeating channel.
-    - Flips the image vertically to match Blender's origin.
-    - Writes the image file to save_path using a temporary Blender image datablock.
-
-    Parameters:
-    - array: numpy ndarray representing the slice (W,H,C) or (W,H,1) or (W,H)
-    - save_path: destination PNG filepath
-    """
-    save_path = Path(save_path)
-    h, w = array.shape[0], array.shape[1]
-    if array.shape[2] == 1:
-        img = np.concatenate([array, array, array], axis=2)
-    else:
-        img = array[..., :3]
-
-    # Blender expects pixels as sequence of floats in RGBA, length w*h*4
-    # NOTE: Blender's image origin is bottom-left; we'll flip vertically for visual consistency.
-    img = np.flipud(img)
-    pixels = np.empty((h * w * 4,), dtype=np.float32)
-    # fill
-    pixels[0::4] = img[..., 0].ravel()
-    pixels[1::4] = img[..., 1].ravel()
-    pixels[2::4] = img[..., 2].ravel()
-    pixels[3::4] = 1.0
-
-    # create a temporary image datablock, save then remove
-    name = "tmp"
-    image = bpy.data.images.new(
-        name, width=w, height=h, alpha=True, float_buffer=False)
-    image.pixels = pixels.tolist()
-    # ensure format and filepath then save
-    image.filepath_raw = str(save_path)
-    image.file_format = "PNG"
-    image.save()
-    # remove from data to avoid clutter
-    try:
-        bpy.data.images.remove(image)
-    except Exception:
-        pass
-
-
 def split_text_to_lines(text: str, max_chars: int = 60) -> list:
     """
     Split `text` into multiple lines not exceeding `max_chars` where possible.
@@ -383,20 +335,3 @@ def refresh_bioxel_panels(context):
             # target node editor and other UI areas that may show previews
             if area.type in {"NODE_EDITOR", "VIEW_3D", "IMAGE_EDITOR", "OUTLINER"}:
                 area.tag_redraw()
-
-
-def load_icon(filepath: Path, key: str):
-    pcoll = PREVIEW_COLLECTIONS["layers"]
-
-    try:
-        icon = pcoll[key].icon_id
-    except KeyError:
-        if filepath.exists():
-            pcoll.load(key, str(filepath), "IMAGE")
-
-        try:
-            icon = pcoll[key].icon_id
-        except KeyError:
-            icon = "TEXTURE"
-
-    return icon